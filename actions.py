@@ -4,17 +4,70 @@ import graphics as gfx
 import levels
 
 import pygame as p
+import heapq
+import math as m
+
+class Scheduler:
+    """
+    Class for running timer actions, which only need touching when they start and finish
+    Timers are counted in simulation ticks, so they finish on the same tick they would in a pipe
+    """
+    def __init__(self):
+        self.tick = 0
+        self.starting = []
+        self.deadlines = []
+        self.count = 0
+
+    def schedule(self, action):
+        """
+        Start an action on the next update, and finish it when its timer runs out
+        """
+        action.scheduled = True
+        self.starting.append(action)
+
+    def cancel(self, action):
+        """
+        Stop a scheduled action without finishing it
+        """
+        action.cancelled = True
+
+    def update(self):
+        self.tick += 1
+
+        #actions scheduled by ones finishing start this tick too, as they would in a pipe
+        while self.starting or (self.deadlines and self.deadlines[0][0] <= self.tick):
+            starting = self.starting
+            self.starting = []
+            for action in starting:
+                if action.cancelled or action.finished:
+                    continue
+                action.start_tick = self.tick
+                action.start()
+
+                #the number of ticks a pipe would take to count the timer down
+                ticks = 1
+                if action.max_timer:
+                    ticks = max(m.ceil((action.max_timer/g.dt) - 1e-9), 1)
+                heapq.heappush(self.deadlines, (self.tick+ticks-1, self.count, action))
+                self.count += 1
+
+            while self.deadlines and self.deadlines[0][0] <= self.tick:
+                action = heapq.heappop(self.deadlines)[2]
+                if not action.cancelled and not action.finished:
+                    action.finish()
 
 class Pipe:
     """
     Class for holding lists of actions
+    Non-blocking actions which can't be blocked and just wait are given to the scheduler instead
+    Only pipes with actions in them are updated, through g.active_pipes
     """
     def __init__(self, name):
         self.name = name
         self.actions = []
+        self.scheduled = set()
 
         g.pipes[self.name] = self
-        g.pipe_list.append(self)
 
     def update_action(self, action):
         """
@@ -28,7 +81,11 @@ class Pipe:
 
     def update(self):
         ran_action = False
+        #finished actions stay in the list until the end of the pass, so none are skipped
         for action in self.actions:
+            if action.finished:
+                continue
+
             if not action.blockable:
                 ran_action = self.update_action(action) or ran_action
 
@@ -44,31 +101,60 @@ class Pipe:
 
         #    self.actions[0].update()
 
+        self.actions = [action for action in self.actions if not action.finished]
+        if not self.actions:
+            g.active_pipes.pop(self.name, None)
+
     def add_action(self, action):
         """
         Add a new action to a pipe
         """
-        self.actions.append(action)
         action.pipe = self
+        if self.name not in g.pipes:
+            #actions in deleted pipes never run
+            action.cancel()
+        elif action.schedulable and not action.blocking and not action.blockable:
+            self.scheduled.add(action)
+            g.scheduler.schedule(action)
+        else:
+            self.actions.append(action)
+            g.active_pipes[self.name] = self
 
     def clear_actions(self, finish=False):
         """
         Remove all actions from this pipe
         """
-        while self.actions:
+        for action in list(self.scheduled):
             if finish:
-                self.actions[0].finish()
+                action.finish()
             else:
-                del self.actions[0]
-                
+                action.cancel()
+
+        #go by index, as finishing an action can add more
+        i = 0
+        while i < len(self.actions):
+            action = self.actions[i]
+            if not action.finished:
+                if finish:
+                    action.finish()
+                else:
+                    action.cancel()
+            i += 1
+        self.actions = []
 
     def delete(self):
+        #actions in deleted pipes never run again
+        for action in list(self.scheduled):
+            action.cancel()
+
         del g.pipes[self.name]
-        g.pipe_list.remove(self)
+        g.active_pipes.pop(self.name, None)
 
     def draw(self):
-        if self.actions:
-            self.actions[0].draw()
+        for action in self.actions:
+            if not action.finished:
+                action.draw()
+                break
 
     def __getstate__(self):
         print("PIPE")
@@ -81,17 +167,47 @@ class Action:
     """
     Base class for actions
     """
+    #whether this action only waits, so can be run by the scheduler when it doesn't block
+    schedulable = True
+
     def __init__(self, pipe, timer, blocking=True, blockable=True):
         self.max_timer = timer
-        self.timer = self.max_timer
-        self.progress = 0
+        self._timer = self.max_timer
+        self._progress = 0
         self.active = False
 
         self.blocking = blocking
         self.blockable = blockable
 
+        self.finished = False
+
+        self.scheduled = False
+        self.cancelled = False
+        self.start_tick = None
+
         pipe.add_action(self)
 
+    @property
+    def timer(self):
+        if self.scheduled and self.start_tick is not None:
+            #counted down once on the tick it starts, and once every tick after
+            return self.max_timer - ((g.scheduler.tick-self.start_tick+1)*g.dt)
+        return self._timer
+
+    @timer.setter
+    def timer(self, value):
+        self._timer = value
+
+    @property
+    def progress(self):
+        if self.scheduled and self.start_tick is not None and self.max_timer:
+            return 1-(max(self.timer,0)/self.max_timer)
+        return self._progress
+
+    @progress.setter
+    def progress(self, value):
+        self._progress = value
+
     def start(self):
         """
         Called when the action starts
@@ -115,7 +231,23 @@ class Action:
         Called when an action finished
         """
         self.active = False
-        self.pipe.actions.remove(self)
+        self.finished = True
+        if self.scheduled:
+            #keep the timer where it stopped
+            self._timer = self.timer
+            self._progress = self.progress
+            self.scheduled = False
+            self.pipe.scheduled.discard(self)
+
+    def cancel(self):
+        """
+        Remove this action without finishing it
+        """
+        self.active = False
+        self.finished = True
+        if self.scheduled:
+            g.scheduler.cancel(self)
+            self.pipe.scheduled.discard(self)
 
     def draw(self):
         pass
@@ -128,6 +260,8 @@ class Action:
         self.__dict__ = gfx.unpickle_state(state)
 
 class VarChangeAction(Action):
+    schedulable = False
+
     def __init__(self, pipe, timer, obj, prop, val, change_type=0, revert=False, blocking=True, blockable=True, force=True, min_val=None, max_val=None):
         super().__init__(pipe, timer, blocking=blocking, blockable=blockable)
         self.obj = obj
@@ -234,6 +368,8 @@ class OverlayAction(Action):
     """
     Action for showing a coloured screen overlay
     """
+    schedulable = False
+
     def __init__(self, pipe, timer, colour, blocking=True, blockable=True, fade_type=0, full_alpha=255):
         super().__init__(pipe, timer, blocking=blocking, blockable=blockable)
 
@@ -262,6 +398,8 @@ class TextEffectAction(Action):
     """
     Action for showing fading text
     """
+    schedulable = False
+
     def __init__(self, pipe, timer, font, text, pos, blocking=True, blockable=True, colour=g.convert_colour("black")):
         super().__init__(pipe, timer, blocking=blocking, blockable=blockable)
 
@@ -282,6 +420,8 @@ class LevelChangeAction(Action):
     """
     Action for changing a level
     """
+    schedulable = False
+
     def __init__(self, pipe, new_level, door=None, blocking=True, blockable=True):
         if type(new_level) == str:
             new_level = g.levels[new_level]
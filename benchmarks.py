@@ -0,0 +1,296 @@
+"""
+Benchmarks for the game's hot paths, run headless
+
+    python benchmarks.py [--save baseline.json] [--compare baseline.json] [--enemies N]
+        [--frames N] [--min-time SECONDS] [--threshold FRACTION] [--only NAME]
+
+Reports calls per second and per-call time percentiles for each benchmark.
+With --compare, benchmarks that got slower than the baseline by more than
+--threshold (default 0.1) are flagged and the exit code is 1.
+"""
+import os
+import sys
+import time
+import json
+import math as m
+
+#has to be set before the game sets up its display
+os.environ["NECRO_HEADLESS"] = "1"
+
+import global_values as g
+import pygame as p
+
+import main
+import graphics as gfx
+import utilities as util
+import entities
+import creatures
+import particles
+import levels
+import items
+
+MIN_TIME = float(g.get_arg("--min-time", 0.5))
+ENEMY_COUNT = int(g.get_arg("--enemies", 8))
+FRAME_COUNT = int(g.get_arg("--frames", 120))
+THRESHOLD = float(g.get_arg("--threshold", 0.1))
+
+LONG_TEXT = " ".join(["The station was in disrepair, something was very wrong."]*12)
+
+class Benchmark:
+    """
+    Class for a single timed operation
+    """
+    def __init__(self, name, func, setup=None, teardown=None, per_call_setup=None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.teardown = teardown
+        self.per_call_setup = per_call_setup
+
+    def run(self, min_time=MIN_TIME, max_calls=None):
+        """
+        Call the function max_calls times, or until min_time has been spent in it, and get the per-call times
+        """
+        if self.setup:
+            self.setup()
+
+        times = []
+        spent = 0
+        while (len(times) < max_calls) if max_calls else (spent < min_time):
+            if self.per_call_setup:
+                self.per_call_setup()
+
+            start_time = time.perf_counter()
+            self.func()
+            elapsed = time.perf_counter()-start_time
+
+            times.append(elapsed)
+            spent += elapsed
+
+        if self.teardown:
+            self.teardown()
+
+        return get_stats(times)
+
+def get_percentile(sorted_times, fraction):
+    index = min(int(len(sorted_times)*fraction), len(sorted_times)-1)
+    return sorted_times[index]
+
+def get_stats(times):
+    """
+    Get ops/sec and percentiles (in ms) from a list of per-call times
+    """
+    if not times:
+        return {"calls":0, "ops_per_sec":0, "p50_ms":0, "p95_ms":0, "p99_ms":0}
+
+    sorted_times = sorted(times)
+    total = sum(times)
+    return {
+        "calls":len(times),
+        "ops_per_sec":len(times)/total if total else 0,
+        "p50_ms":get_percentile(sorted_times, 0.5)*1000,
+        "p95_ms":get_percentile(sorted_times, 0.95)*1000,
+        "p99_ms":get_percentile(sorted_times, 0.99)*1000,
+    }
+
+#game state helpers
+def start_game():
+    """
+    Start a fresh game with the player armed and unable to die
+    """
+    g.start_slides_shown = True
+    main.start_game()
+    g.player.inventory.add_item(items.Shotgun())
+    g.player.inventory.add_item(items.Revolver())
+    keep_player_alive()
+
+def keep_player_alive():
+    g.player.health = g.player.max_health
+
+def go_to_level(name):
+    level = g.levels[name]
+    levels.change_level(level, show_text=False)
+    g.player.x = level.rect.w//2
+    g.player.y = level.rect.h - g.player.rect.h
+    g.player.update_rect()
+    g.camera.update()
+    return level
+
+def spawn_enemies(level, amount, name="BasicEnemy"):
+    """
+    Spread some enemies across a level
+    """
+    spawned = []
+    for i in range(amount):
+        x = int((i+0.5) * level.rect.w / amount)
+        spawned.append(creatures.spawn_enemy(name, x, level.rect.h - 32, level))
+    return spawned
+
+def clear_level(level):
+    """
+    Remove everything that isn't part of the level layout or the player
+    """
+    for entity in level.entities[:]:
+        if entity is not g.player and not isinstance(entity, levels.Structure):
+            entity.delete()
+
+def clear_particles():
+    for manager in g.elements.get("class_ParticleManager", []):
+        manager.clear()
+
+def run_frame():
+    """
+    Run one whole frame, with exactly one simulation tick
+    """
+    g.tick_accumulator = g.dt
+    main.run_frame()
+
+#benchmarks
+def get_benchmarks():
+    benchmarks = []
+    test_level = g.levels["Hallway"]
+
+    #collision
+    def collision_setup():
+        go_to_level(test_level.name)
+        spawn_enemies(test_level, ENEMY_COUNT)
+    def check_collision():
+        util.check_collision(g.player.rect, obj=g.player, collision_filter=g.player.get_collision_filter())
+    benchmarks.append(Benchmark("check_collision", check_collision, setup=collision_setup, teardown=lambda: clear_level(test_level)))
+
+    #movement
+    mover = []
+    def move_setup():
+        go_to_level(test_level.name)
+        spawn_enemies(test_level, ENEMY_COUNT)
+        mover.clear()
+        mover.append(entities.Entity(p.Rect(8, test_level.rect.h-16, 8, 8), test_level))
+    def move():
+        entity = mover[0]
+        entity.move(30, 0)
+        entity.move(-30, 0)
+    def move_towards():
+        entity = mover[0]
+        entity.move_towards(entity.x+30, entity.y-10, 30)
+        entity.move_towards(entity.x-30, entity.y+10, 30)
+    def move_teardown():
+        mover[0].delete()
+        clear_level(test_level)
+    benchmarks.append(Benchmark("Entity.move", move, setup=move_setup, teardown=move_teardown))
+    benchmarks.append(Benchmark("Entity.move_towards", move_towards, setup=move_setup, teardown=move_teardown))
+
+    #shooting
+    shotgun = items.Shotgun()
+    def fire_setup():
+        go_to_level(test_level.name)
+        spawn_enemies(test_level, ENEMY_COUNT, name="LargeEnemy")
+        shotgun.holder = g.player
+    def fire():
+        g.player.angle = m.pi if g.player.direction == "left" else 0
+        shotgun.fire()
+    def fire_per_call():
+        clear_particles()
+        for enemy in g.elements.get("class_Enemy", []):
+            enemy.health = enemy.max_health
+    benchmarks.append(Benchmark("Gun.fire (shotgun)", fire, setup=fire_setup, teardown=lambda: clear_level(test_level), per_call_setup=fire_per_call))
+
+    #particles
+    effect = []
+    def particles_setup():
+        go_to_level(test_level.name)
+        effect.clear()
+        effect.append(particles.create_blood(test_level, g.player.rect.center, 0, headshot=True))
+    def particles_update():
+        effect[0].creation_time = p.time.get_ticks()
+        effect[0].update()
+    def particles_draw():
+        effect[0].draw()
+    def particles_teardown():
+        clear_particles()
+    benchmarks.append(Benchmark("Emitter.update", particles_update, setup=particles_setup, teardown=particles_teardown))
+    benchmarks.append(Benchmark("Emitter.draw", particles_draw, setup=particles_setup, teardown=particles_teardown))
+
+    #graphics
+    anim = g.spritesheets["basic_enemy_ss"].create_animation(1, 0.25, ping_pong=True)
+    benchmarks.append(Benchmark("Animation.get_frame", anim.get_frame))
+
+    wrap_rect = g.screen_rect.inflate(-8, -8)
+    benchmarks.append(Benchmark("draw_wrapped_text", lambda: gfx.draw_wrapped_text("font1_1", LONG_TEXT, wrap_rect, spacing=10)))
+
+    map_control = g.elements["class_MapControl"][0]
+    benchmarks.append(Benchmark("MapControl.draw", map_control.draw, setup=lambda: go_to_level(test_level.name)))
+
+    #level loading
+    def load_level():
+        old_level = g.levels["Eng IV"]
+        new_level = levels.Level("Eng IV")
+        for entity in new_level.entities[:]:
+            entity.delete()
+        g.levels[old_level.name] = old_level
+    benchmarks.append(Benchmark("Level.__init__", load_level))
+
+    #whole frames
+    for name in sorted(g.levels):
+        level = g.levels[name]
+        def frame_setup(level=level):
+            go_to_level(level.name)
+            spawn_enemies(level, ENEMY_COUNT)
+        benchmarks.append(Benchmark(f"frame: {name}", run_frame, setup=frame_setup, teardown=lambda level=level: clear_level(level), per_call_setup=keep_player_alive))
+
+    return benchmarks
+
+def compare(results, baseline):
+    """
+    Get the benchmarks which have slowed down compared to a baseline
+    """
+    regressions = []
+    for name, stats in results.items():
+        old_stats = baseline.get(name)
+        if not old_stats or not old_stats["ops_per_sec"]:
+            continue
+        change = (stats["ops_per_sec"]/old_stats["ops_per_sec"]) - 1
+        stats["change"] = change
+        if change < -THRESHOLD:
+            regressions.append(name)
+    return regressions
+
+def print_results(results, regressions):
+    print(f"{'benchmark':<28}{'ops/sec':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'change':>9}")
+    for name, stats in results.items():
+        change = f"{stats['change']*100:+.1f}%" if "change" in stats else ""
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<28}{stats['ops_per_sec']:>12.1f}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{change:>9}{flag}")
+
+def run_benchmarks():
+    start_game()
+
+    only = g.get_arg("--only")
+    results = {}
+    for benchmark in get_benchmarks():
+        if only and only not in benchmark.name:
+            continue
+
+        if benchmark.name.startswith("frame: "):
+            results[benchmark.name] = benchmark.run(min_time=0, max_calls=FRAME_COUNT)
+        else:
+            results[benchmark.name] = benchmark.run()
+        keep_player_alive()
+
+    regressions = []
+    compare_path = g.get_arg("--compare")
+    if compare_path:
+        with open(compare_path) as baseline_file:
+            regressions = compare(results, json.loads(baseline_file.read()))
+
+    print_results(results, regressions)
+
+    save_path = g.get_arg("--save")
+    if save_path:
+        with open(save_path, "w") as baseline_file:
+            baseline_file.write(json.dumps(results, indent=1))
+
+    return regressions
+
+if __name__ == "__main__":
+    regressions = run_benchmarks()
+    sys.exit(1 if regressions else 0)
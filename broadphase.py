@@ -0,0 +1,57 @@
+class SpatialGrid:
+    """
+    Broadphase for the entities in a level
+    Levels are horizontal strips, so entities are bucketed into columns along x
+    """
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def get_span(self, rect):
+        """
+        Get the first and last column a rect covers
+        """
+        first = rect.left//self.cell_size
+        last = (rect.right-1)//self.cell_size
+        if last < first:
+            last = first
+        return (first, last)
+
+    def insert(self, entity):
+        span = self.get_span(entity.rect)
+        entity.grid_span = span
+        for column in range(span[0], span[1]+1):
+            if column in self.cells:
+                self.cells[column].append(entity)
+            else:
+                self.cells[column] = [entity]
+
+    def remove(self, entity):
+        span = entity.grid_span
+        if span is None:
+            return
+        for column in range(span[0], span[1]+1):
+            self.cells[column].remove(entity)
+        entity.grid_span = None
+
+    def update(self, entity):
+        """
+        Move an entity to the right columns after its rect has changed
+        """
+        if self.get_span(entity.rect) != entity.grid_span:
+            self.remove(entity)
+            self.insert(entity)
+
+    def query(self, rect):
+        """
+        Get the entities which might overlap a rect
+        """
+        first, last = self.get_span(rect)
+        if first == last:
+            return self.cells.get(first, ())
+
+        candidates = {}
+        for column in range(first, last+1):
+            for entity in self.cells.get(column, ()):
+                candidates[entity] = None
+        return candidates.keys()
@@ -17,6 +17,12 @@ class Camera(elements.Element):
         rect = p.Rect(0, 0, 64, 64)
         super().__init__(rect)
 
+        #interpolated camera position, and offset of the element being drawn
+        self.render_x = self.x
+        self.render_y = self.y
+        self.element_offset_x = 0
+        self.element_offset_y = 0
+
     def update(self):
         if self.old_parent_direction != self.parent.direction:
             self.old_parent_direction = self.parent.direction
@@ -35,8 +41,29 @@ class Camera(elements.Element):
 
 
 
+    def begin_draw(self, alpha):
+        """
+        Set up the camera to draw a frame alpha of the way between the last two ticks
+        """
+        offset_x, offset_y = self.get_interpolation_offset(alpha)
+        self.render_x = self.x + offset_x
+        self.render_y = self.y + offset_y
+        self.set_element_offset((0, 0))
+
+    def get_view_rect(self, margin=0):
+        """
+        Get the world-space rect seen by the camera this frame, grown by a margin on each side
+        """
+        return p.Rect(self.render_x-margin, self.render_y-margin, g.WIDTH+(margin*2), g.HEIGHT+(margin*2))
+
+    def set_element_offset(self, offset):
+        """
+        Set the interpolation offset applied to everything drawn until it's changed
+        """
+        self.element_offset_x, self.element_offset_y = offset
+
     def transform_point(self, point):
-        new_point = (point[0]-self.x, point[1]-self.y)
+        new_point = (point[0]+self.element_offset_x-self.render_x, point[1]+self.element_offset_y-self.render_y)
         return new_point
 
     def transform_rect(self, rect):
@@ -44,34 +71,35 @@ class Camera(elements.Element):
         Transform a rect from world-space to camera-space
         """
         new_rect = rect.copy()
-        new_rect.x -= self.x
-        new_rect.y -= self.y
+        new_rect.x += self.element_offset_x-self.render_x
+        new_rect.y += self.element_offset_y-self.render_y
         return new_rect
 
     def draw_rect(self, colour, rect, border=0):
+        g.render_queue.flush()
         p.draw.rect(g.screen, g.convert_colour(colour), self.transform_rect(rect), border)
 
     def draw_circle(self, colour, pos, radius, border=0):
+        g.render_queue.flush()
         p.draw.circle(g.screen, g.convert_colour(colour), self.transform_point(pos), radius, border)
 
     def draw_gfx(self, drawing_gfx, pos, flip_h=False):
         if drawing_gfx:
             surf = gfx.get_surface(drawing_gfx)
             if flip_h:
-                surf = p.transform.flip(surf, True, False)
-            g.screen.blit(surf, self.transform_point(pos))
+                surf = gfx.get_flipped(surf, True, False)
+            g.render_queue.add(surf, self.transform_point(pos))
 
     def set_at(self, pos, colour):
         x,y = self.transform_point(pos)
         x = int(x)
         y = int(y)
+        g.render_queue.flush()
         g.screen.set_at((x, y), g.convert_colour(colour))
 
     def draw_rotated_gfx(self, rotating_gfx, angle, pos, ox=0.5, oy=0.5, xflip=False, yflip=False):
         surf = gfx.get_surface(rotating_gfx)
-        if xflip or yflip:
-            surf = p.transform.flip(surf, xflip, yflip)
-        rotated_surface = p.transform.rotate(surf, m.degrees(-angle))
+        rotated_surface, angle = gfx.get_rotated(surf, angle, xflip, yflip)
 
         #create offset
         rw = rotated_surface.get_width()
@@ -86,7 +114,7 @@ class Camera(elements.Element):
         tx += m.cos( angle + (m.pi/2) )/2 * rh * (-1 + oy*2) 
         ty += m.sin( angle + (m.pi/2) )/2 * rw * (-1 + oy*2) 
 
-        g.screen.blit(rotated_surface, self.transform_point((pos[0]+cx-tx, pos[1]+cy-ty)))
+        g.render_queue.add(rotated_surface, self.transform_point((pos[0]+cx-tx, pos[1]+cy-ty)))
 
         #p.draw.circle(g.screen, "green", self.transform_point((pos[0]+tx, pos[1]+ty)), 1)
         #p.draw.circle(g.screen, "yellow", self.transform_point((pos[0]-tx, pos[1])), 1)
@@ -27,6 +27,52 @@ class Control(elements.Element):
     def draw(self):
         super().draw()
 
+class RetainedControl(Control):
+    """
+    Base class for controls which keep what they've drawn, only drawing it again when what they show changes
+    Subclasses implement get_render_state and render instead of draw
+    """
+    def __init__(self, rect, active_states):
+        super().__init__(rect, active_states)
+        self.render_state = None
+        self.rendered = None
+        self.rendered_pos = (0,0)
+
+    def get_render_state(self):
+        """
+        Get everything this control's drawing depends on, as something which can be compared
+        """
+        return None
+
+    def render(self):
+        """
+        Draw this control onto g.screen, which is a blank layer while this is called
+        """
+        pass
+
+    def draw(self):
+        state = self.get_render_state()
+        if self.rendered is None or state != self.render_state:
+            self.render_state = state
+
+            #draw onto a transparent layer by swapping it in for the screen
+            g.render_queue.flush()
+            layer = p.Surface(g.screen.get_size(), p.SRCALPHA)
+            layer.fill((0,0,0,0))
+            screen = g.screen
+            g.screen = layer
+            try:
+                self.render()
+                g.render_queue.flush()
+            finally:
+                g.screen = screen
+
+            #keep only the part which was drawn on
+            bounds = layer.get_bounding_rect()
+            self.rendered = layer.subsurface(bounds).copy()
+            self.rendered_pos = bounds.topleft
+
+        g.screen.blit(self.rendered, self.rendered_pos)
 
 class Button(Control):
     """
@@ -233,54 +279,74 @@ class EndScreenControl(SlidesControl):
     def draw(self):
         super().draw()
 
-class HealthControl(Control):
+class HealthControl(RetainedControl):
     """
     Control for showing player health
     """
     def __init__(self, rect, active_states):
         super().__init__(rect, active_states)
 
-    def draw(self):
+    def get_render_state(self):
+        return str(int(m.ceil(g.player.health)))
+
+    def render(self):
         p.draw.rect(g.screen, g.convert_colour("green"), self.rect)
 
-        health_string = str(int(m.ceil(g.player.health)))
+        health_string = self.render_state
 
         gfx.draw_text("font1_1", health_string, self.rect.move(1, 0).center, cx=True, cy=True)
 
 
-class ItemControl(Control):
+class ItemControl(RetainedControl):
     """
     Control for showing the current player item
     """
     def __init__(self, rect, active_states):
         super().__init__(rect, active_states)
 
-    def draw(self):
+    def get_render_state(self):
+        """
+        Get the item, and for guns the ammunition and the positions of the recharge and cooldown bars
+        """
         item = g.player.inventory.selected_item
+        if not isinstance(item, items.Gun):
+            return (item, None, None, None)
+
+        remaining_space = self.rect.w-item.icon.get_width()
+
+        recharge_x = None
+        if item.recharge:
+            ammunition_frac = item.ammunition % 1
+            recharge_x = int(remaining_space*ammunition_frac)
+
+        cooldown_x = None
+        ticks = p.time.get_ticks()
+        if item.last_fire_time and (ticks - item.last_fire_time)/1000 < item.max_cooldown:
+            cooldown_frac = (ticks - item.last_fire_time)/1000/item.max_cooldown
+            cooldown_x = int(remaining_space*cooldown_frac)
+
+        return (item, int(item.ammunition), recharge_x, cooldown_x)
+
+    def render(self):
+        item, ammunition, recharge_x, cooldown_x = self.render_state
         if item:
             g.screen.blit(item.icon, self.rect)
 
             #draw ammunition
             if isinstance(item, items.Gun):
                 icon_width = item.icon.get_width()
-                remaining_space = self.rect.w-icon_width
 
-                if item.recharge:
-                    ammunition_frac = item.ammunition % 1
-                    x = int(remaining_space*ammunition_frac)
-                    p.draw.rect(g.screen, g.convert_colour("blue"), p.Rect(self.rect.x+icon_width+x, self.rect.y, 1, self.rect.h))
+                if recharge_x is not None:
+                    p.draw.rect(g.screen, g.convert_colour("blue"), p.Rect(self.rect.x+icon_width+recharge_x, self.rect.y, 1, self.rect.h))
 
-                ticks = p.time.get_ticks()
-                if item.last_fire_time and (ticks - item.last_fire_time)/1000 < item.max_cooldown:
-                    cooldown_frac = (ticks - item.last_fire_time)/1000/item.max_cooldown
-                    x = int(remaining_space*cooldown_frac)
-                    p.draw.rect(g.screen, g.convert_colour("brown"), p.Rect(self.rect.x+icon_width+x, self.rect.y, 1, self.rect.h))
+                if cooldown_x is not None:
+                    p.draw.rect(g.screen, g.convert_colour("brown"), p.Rect(self.rect.x+icon_width+cooldown_x, self.rect.y, 1, self.rect.h))
 
-                ammunition_string = f"x{int(item.ammunition)}"
+                ammunition_string = f"x{ammunition}"
                 gfx.draw_text("font1_1", ammunition_string, self.rect.move((icon_width + 1, -self.rect.h/2 + 1)).topleft)
 
                 
-class MapControl(Control):
+class MapControl(RetainedControl):
     """
     Control for displaying a minimap
     """
@@ -288,46 +354,84 @@ class MapControl(Control):
         super().__init__(rect, active_states)
         self.pixel_size = 64
 
-    def draw(self):
-        surf = p.Surface((self.rect.w, self.rect.h))
-        surf.fill(g.convert_colour("black"))
-        offset_x = (g.player.level.world_x) + (g.player.rect.centerx//self.pixel_size)
-        offset_y = (g.player.level.world_y)
-        for level in g.levels.values():
-            lx = level.world_x
-            ly = level.world_y
-            lw = level.rect.w//self.pixel_size
-            lh = level.rect.h//self.pixel_size
-            if level == g.player.level:
-                colour = "blue"
-            else:
-                lum = int(255/lw)
-                cr = max(min(int(lum*0.75), 255), 64)
-                cg = max(min(int(lum*2), 255), 64)
-                cb = max(min(int(lum*0.75), 255), 64)
-                colour = (cr,cg,cb)
+        self.surface = p.Surface((self.rect.w, self.rect.h))
 
-            #if level.name == "Eng I":
-            #    print(lx, ly)
-            #    colour = "yellow"
+        #the whole station, which only changes when levels are reloaded or the power is diverted
+        self.base_surface = None
+        self.base_x = 0
+        self.base_y = 0
+        self.base_key = None
+
+    def get_level_map_rect(self, level):
+        return p.Rect(level.world_x, level.world_y, level.rect.w//self.pixel_size, level.rect.h//self.pixel_size)
+
+    def get_shuttle_points(self, level):
+        """
+        Get the map positions of the shuttles in a level, if they're shown
+        """
+        points = []
+        if g.power_diverted:
+            for shuttle in g.elements.get("class_Shuttle",[]):
+                if shuttle in level.structures:
+                    points.append((level.world_x+int( (shuttle.x+1) //self.pixel_size), level.world_y))
+        return points
+
+    def render_base(self):
+        """
+        Draw every level and shuttle onto the base surface
+        """
+        map_rects = [self.get_level_map_rect(level) for level in g.levels.values()]
+        bounds = map_rects[0].unionall(map_rects[1:])
+        bounds.w += 1
+        bounds.h += 1
+
+        self.base_x = bounds.x
+        self.base_y = bounds.y
+        self.base_surface = p.Surface(bounds.size)
+        self.base_surface.fill(g.convert_colour("black"))
+
+        for level, map_rect in zip(g.levels.values(), map_rects):
+            lum = int(255/map_rect.w)
+            cr = max(min(int(lum*0.75), 255), 64)
+            cg = max(min(int(lum*2), 255), 64)
+            cb = max(min(int(lum*0.75), 255), 64)
+            colour = (cr,cg,cb)
 
             # I'm ok using non-palette colors in the map - Ghast
-            p.draw.rect(surf, colour, p.Rect(lx-offset_x+ (self.rect.w//2), ly-offset_y+ (self.rect.h//2), lw, lh))
+            p.draw.rect(self.base_surface, colour, map_rect.move(-self.base_x, -self.base_y))
 
-            if level == g.player.level:
-                px = lx+int( (g.player.x+1) //self.pixel_size)
-                surf.set_at((px-offset_x+ (self.rect.w//2), ly-offset_y+ (self.rect.h//2)), "red")
+            for px, py in self.get_shuttle_points(level):
+                self.base_surface.set_at((px-self.base_x, py-self.base_y), "red")
 
-            if g.power_diverted:
-                for shuttle in g.elements.get("class_Shuttle",[]):
-                    if shuttle in level.structures:
-                        px = lx+int( (shuttle.x+1) //self.pixel_size)
-                        surf.set_at((px-offset_x+ (self.rect.w//2), ly-offset_y+ (self.rect.h//2)), "red")
+    def get_render_state(self):
+        base_key = (g.power_diverted, tuple(g.levels.values()))
+        offset_x = (g.player.level.world_x) + (g.player.rect.centerx//self.pixel_size) - (self.rect.w//2)
+        offset_y = (g.player.level.world_y) - (self.rect.h//2)
+        return (base_key, g.player.level, offset_x, offset_y, int( (g.player.x+1) //self.pixel_size))
 
+    def render(self):
+        base_key, level, offset_x, offset_y, player_x = self.render_state
+        if base_key != self.base_key:
+            self.render_base()
+            self.base_key = base_key
+
+        surf = self.surface
+        surf.fill(g.convert_colour("black"))
+
+        surf.blit(self.base_surface, (self.base_x-offset_x, self.base_y-offset_y))
+
+        #current level and markers on top
+        p.draw.rect(surf, "blue", self.get_level_map_rect(level).move(-offset_x, -offset_y))
+
+        px = level.world_x+player_x
+        surf.set_at((px-offset_x, level.world_y-offset_y), "red")
+
+        for px, py in self.get_shuttle_points(level):
+            surf.set_at((px-offset_x, py-offset_y), "red")
 
         g.screen.blit(surf, self.rect)
 
-class InventoryControl(Control):
+class InventoryControl(RetainedControl):
     """
     Control for displaying all inventory slots
     """
@@ -342,11 +446,11 @@ class InventoryControl(Control):
 
         self.highlighted_slot = None
 
-    def draw(self):
-        self.highlighted_slot = None
-
-        g.screen.blit(gfx.get_surface("inventory_background"), self.rect)
-
+    def get_slot_rects(self):
+        """
+        Get the rect of each inventory slot
+        """
+        slot_rects = []
         x = self.sep_h
         y = self.start_y
         
@@ -356,11 +460,50 @@ class InventoryControl(Control):
             else:
                 w = self.cell_size
             rect = p.Rect(x, y, w, self.cell_size)
+            slot_rects.append(rect)
 
-            colour = "black"
+            x = rect.right + self.sep_h
+
+            if x + self.cell_size >= self.rect.right:
+                x = self.sep_h
+                y += self.cell_size + self.sep_v
+        return slot_rects
+
+    def update(self):
+        super().update()
+        self.highlighted_slot = None
+        for i, rect in enumerate(self.get_slot_rects()):
             if rect.collidepoint((g.mx, g.my)):
                 self.highlighted_slot = i
 
+    def get_detail_strings(self):
+        """
+        Get the name and details of the highlighted item
+        """
+        if self.highlighted_slot is not None:
+            detail_item = self.inventory.slots[self.highlighted_slot]
+            if detail_item:
+                extra_detail_string = ""
+                if isinstance(detail_item, items.Gun):
+                    extra_detail_string = f"{int(detail_item.ammunition)}/{detail_item.max_ammunition} rnds"
+                elif type(detail_item) == items.HealthDrink:
+                    extra_detail_string = "+3 HP"
+                elif type(detail_item) == items.Medkit:
+                    extra_detail_string = "+5 HP"
+                return detail_item.name, extra_detail_string
+        return None
+
+    def get_render_state(self):
+        slots = tuple((cell, cell.amount) if cell else None for cell in self.inventory.slots)
+        return (slots, self.inventory.selected_index, self.highlighted_slot, self.get_detail_strings())
+
+    def render(self):
+        g.screen.blit(gfx.get_surface("inventory_background"), self.rect)
+
+        for i, rect in enumerate(self.get_slot_rects()):
+            cell = self.inventory.slots[i]
+
+            colour = "black"
             if self.inventory.selected_index == i:
                 colour = "red"
             elif self.highlighted_slot == i:
@@ -379,31 +522,15 @@ class InventoryControl(Control):
                     amount_string = str(cell.amount)
                     gfx.draw_text("font1_1", amount_string, rect.move((0,-self.cell_size)).center, cx=True, cy=True, colour="blue")
 
-            x = rect.right + self.sep_h
+        detail_strings = self.get_detail_strings()
+        if detail_strings:
+            detail_string, extra_detail_string = detail_strings
+            x = self.rect.centery
+            y = 48
+            gfx.draw_text("font1_1", detail_string, (x,y), cx=True, cy=True)
 
-            if x + self.cell_size >= self.rect.right:
-                x = self.sep_h
-                y += self.cell_size + self.sep_v
-
-        if self.highlighted_slot is not None:
-            detail_item = self.inventory.slots[self.highlighted_slot]
-            if detail_item:
-                x = self.rect.centery
-                y = 48
-                detail_string = detail_item.name
-                gfx.draw_text("font1_1", detail_string, (x,y), cx=True, cy=True)
-
-                y += 8
-                extra_detail_string = ""
-                if isinstance(detail_item, items.Gun):
-                    extra_detail_string = f"{int(detail_item.ammunition)}/{detail_item.max_ammunition} rnds"
-                elif type(detail_item) == items.HealthDrink:
-                    extra_detail_string = "+3 HP"
-                elif type(detail_item) == items.Medkit:
-                    extra_detail_string = "+5 HP"
-
-
-                gfx.draw_text("font1_1", extra_detail_string, (x,y), cx=True, cy=True)
+            y += 8
+            gfx.draw_text("font1_1", extra_detail_string, (x,y), cx=True, cy=True)
 
 class GraphicsScreenControl(Control):
     """
@@ -431,7 +558,7 @@ class GraphicsScreenControl(Control):
             self.button_exit.delete()
         super().delete()
 
-class TextScreenControl(Control):
+class TextScreenControl(RetainedControl):
     """
     Control for displaying text on screen
     """
@@ -480,7 +607,10 @@ class TextScreenControl(Control):
         if self.scroll > self.scroll_space:
             self.scroll = self.scroll_space
 
-    def draw(self):
+    def get_render_state(self):
+        return (self.text, self.scroll)
+
+    def render(self):
         g.screen.blit(self.background_gfx, self.rect)
 
         text_rect = self.rect.copy()
@@ -504,7 +634,7 @@ class TextScreenControl(Control):
         self.button_up.delete()
         g.player.control_locks -= 1
 
-class Popup(Control):
+class Popup(RetainedControl):
     """
     Control for showing popup text
     """
@@ -537,7 +667,10 @@ class Popup(Control):
             button_rect.bottomright = self.rect.bottomright
             self.button_reject = Button(button_rect, func2, button_anims[3][0], button_anims[3][1], button_anims[3][2], self.active_states)
 
-    def draw(self):
+    def get_render_state(self):
+        return (self.line1, self.line2)
+
+    def render(self):
         g.screen.blit(self.background_gfx, self.rect)
         x = self.rect.centery
         y = self.rect.y + 8
@@ -630,8 +763,11 @@ class Keypad_Popup(Popup):
             button.delete()
         super().delete()
 
-    def draw(self):
-        super().draw()
+    def get_render_state(self):
+        return (super().get_render_state(), self.entered_code)
+
+    def render(self):
+        super().render()
         x = self.rect.centerx
         y = 16
         #print(self.entered_code)
@@ -660,7 +796,7 @@ class Item_Popup(Popup):
                 else:
                     self.pickup.interaction_enabled = False
 
-class Timer(Control):
+class Timer(RetainedControl):
     """
     Control for displaying a timer on screen associated with an action
     """
@@ -676,14 +812,17 @@ class Timer(Control):
         if self.action.progress >= 1:
             self.delete()
 
-    def draw(self):
+    def get_render_state(self):
         minutes = str(int(self.action.timer // 60)).zfill(2)
         seconds = str(int(self.action.timer % 60)).zfill(2)
         seconds_decimal = int(round(self.action.timer % 1, 1)*10)
         if seconds_decimal == 10:
             seconds_decimal = 0
 
-        timer_string = f"{minutes}:{seconds}.{seconds_decimal}"
+        return f"{minutes}:{seconds}.{seconds_decimal}"
+
+    def render(self):
+        timer_string = self.render_state
         if self.shadow_pos:
             gfx.draw_text(self.font_name, timer_string, self.rect.move(self.shadow_pos).center, cx=True, cy=True, colour=g.colour_remaps["beige"], alpha=255)
             
@@ -90,20 +90,22 @@ class Creature(entities.Entity):
     def get_direction_for_rendering(self):
         return self.direction
 
-    def draw(self):
+    def update_surface(self):
         if self.get_direction_for_rendering() == "right":
             flip_h = False
         else:
             flip_h = True
 
-        surf = gfx.get_surface(self.gfx)
-        if flip_h or self.flip_h or self.flip_v:
-            self.surface = p.transform.flip(surf, (flip_h or self.flip_h), self.flip_v)
-        else:
-            self.surface = surf
+        #keep the unflipped frame, so its mask can be looked up by frame
+        self.surface = gfx.get_surface(self.gfx)
+        self.surface_flip = ((flip_h or self.flip_h), self.flip_v)
 
-        #gfx.get_mask(self.surface).to_surface()
-        g.camera.draw_gfx( self.surface , self.rect.topleft)
+    def draw(self):
+        self.update_surface()
+        surf = gfx.get_flipped(self.surface, *self.surface_flip)
+
+        #gfx.get_mask(self.surface, *self.surface_flip).to_surface()
+        g.camera.draw_gfx( surf , self.rect.topleft)
 
         if self.stun_effect:
             state = r.getstate()
@@ -319,13 +321,13 @@ class SpiderEnemy(Enemy):
                 self.attacking = True
                 actions.FuncCallAction(self.pipe, self.attack_time, self, "attack", change_type=1, blocking=False, blockable=False)
 
-    def draw(self):
+    def update_surface(self):
         if self.on_ceiling:
             self.flip_v = True
         else:
             self.flip_v = False
 
-        super().draw()
+        super().update_surface()
 
 class RecoverEnemy(Enemy):
     """
@@ -12,7 +12,9 @@ class Element:
     def __init__(self, rect, z_index=0):
         self.rect = rect
         self.set_from_rect()
-        self.z_index = z_index
+        self.store_previous_position()
+        self._z_index = z_index
+        self.element_id = g.element_id_number
 
         self.class_names = []
 
@@ -29,12 +31,36 @@ class Element:
             else:
                 g.elements[name] = [self]
     
-        pipe_name = self.__class__.__name__+str(g.element_id_number)
-        self.pipe = actions.Pipe(pipe_name)
+        #the pipe is only made once something gives this element an action
+        self.pipe_name = self.__class__.__name__+str(g.element_id_number)
+        self._pipe = None
         g.element_id_number += 1
 
         g.element_list.append(self)
 
+    @property
+    def pipe(self):
+        if self._pipe is None:
+            self._pipe = actions.Pipe(self.pipe_name)
+            if self.deleted:
+                self._pipe.delete()
+        return self._pipe
+
+    @property
+    def z_index(self):
+        return self._z_index
+
+    @z_index.setter
+    def z_index(self, value):
+        self._z_index = value
+        self.z_index_changed()
+
+    def z_index_changed(self):
+        """
+        Called when this element's z index is set
+        """
+        pass
+
     def set_from_rect(self):
         """
         Update this rectangle's position from their rectangular position
@@ -49,6 +75,24 @@ class Element:
         self.rect.x = self.x
         self.rect.y = self.y
 
+    def store_previous_position(self):
+        """
+        Remember this element's position before a simulation tick, for interpolation
+        """
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    def get_interpolation_offset(self, alpha):
+        """
+        Get the offset from this element's position to where it should be drawn
+        alpha is how far the frame is between the previous tick and the latest one
+        """
+        dx = self.x - self.prev_x
+        dy = self.y - self.prev_y
+        if abs(dx) > g.INTERPOLATION_SNAP or abs(dy) > g.INTERPOLATION_SNAP:
+            return (0, 0)
+        return (dx*(alpha-1), dy*(alpha-1))
+
     def update(self):
         """
         Update this element
@@ -61,7 +105,8 @@ class Element:
     def delete(self):
         if not self.deleted:
             self.deleted = True
-            self.pipe.delete()
+            if self._pipe is not None:
+                self._pipe.delete()
             for class_name in self.class_names:
                 g.elements[class_name].remove(self)
             g.element_list.remove(self)
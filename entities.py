@@ -9,16 +9,21 @@ class Entity(elements.Element):
     """
     Base class for all entities (world objects)
     """
+    level = None
+
     def __init__(self, rect, level, entity_gfx=None, solid=True, mask=None, collision_exceptions=[], collision_dict={}):
         super().__init__(rect)
         self.level = None
+        self.grid_span = None
         self.set_level(level)
         self.gfx = entity_gfx
         self.surface = None
+        self.surface_flip = (False, False)  # how the surface is flipped when drawn
 
         self.solid = solid
         self.last_collision = None
         self.collision_exceptions = collision_exceptions
+        self.collision_category = util.get_collision_category(self)
         self.collision_dict = collision_dict
         self.mask = mask
 
@@ -27,6 +32,25 @@ class Entity(elements.Element):
         self.change_x = self.x-self.old_vx
         self.change_y = self.y-self.old_vy
 
+    @property
+    def collision_dict(self):
+        return self._collision_dict
+
+    @collision_dict.setter
+    def collision_dict(self, value):
+        self._collision_dict = value
+        self.collision_filter = None
+        self.collision_filter_version = None
+
+    def get_collision_filter(self):
+        """
+        Get this entity's collision dict compiled into a collision mask, compiling it again if it's out of date
+        """
+        if self.collision_filter_version != g.collision_filter_version:
+            self.collision_filter = util.compile_collision_dict(self._collision_dict)
+            self.collision_filter_version = g.collision_filter_version
+        return self.collision_filter
+
     def update(self):
         super().update()
         self.change_x = self.x-self.old_vx
@@ -34,6 +58,16 @@ class Entity(elements.Element):
         self.old_vx = self.x
         self.old_vy = self.y
 
+        #collision masks come from the surface, so keep it set for entities that aren't drawn
+        self.update_surface()
+
+    def update_surface(self):
+        """
+        Set the surface (and how it's flipped) this entity is drawn with
+        """
+        if self.gfx:
+            self.surface = gfx.get_surface(self.gfx)
+
     def update_inactive(self):
         """
         Update this entity when it's not in the same level as the player
@@ -47,12 +81,27 @@ class Entity(elements.Element):
         #remove from old level
         if self.level:
             self.level.entities.remove(self)
+            self.level.grid.remove(self)
+            self.level.remove_from_render_list(self)
 
         if level:
             self.level = level
 
             #add to new level
             self.level.entities.append(self)
+            self.level.grid.insert(self)
+            self.level.add_to_render_list(self)
+
+    def z_index_changed(self):
+        #keep the level's render list in order
+        if self.level:
+            self.level.remove_from_render_list(self)
+            self.level.add_to_render_list(self)
+
+    def update_rect(self):
+        super().update_rect()
+        if self.level:
+            self.level.grid.update(self)
 
     def move_towards(self, x, y, speed, detail=False):
         """
@@ -74,43 +123,28 @@ class Entity(elements.Element):
         Move some distance, accounting for collision
         """
         steps = m.ceil(max(abs(x), abs(y)))
-        nx = self.x
-        ny = self.y
-        new_rect = self.rect.copy()
         if not steps:
             return
-            
-        ax = x/steps
-        ay = y/steps
-        
-        result = None
-        for _ in range(steps):
-            nx += ax
-            ny += ay
-            new_rect.x = nx
-            new_rect.y = ny
-            result = util.check_collision(new_rect, obj=self, _collision_dict=self.collision_dict, exceptions=self.collision_exceptions, detail=detail, mask=self.mask)
-
-            if result:
-                nx -= ax
-                ny -= ay
-
-                new_rect.x = nx
-                new_rect.y = ny
-
-                self.last_collision = result
-                break
-
-        self.x = nx
-        self.y = ny
+
+        free_steps, result = util.sweep(self.x, self.y, self.rect.w, self.rect.h, x, y, obj=self, mask=self.mask,
+                                        collision_filter=self.get_collision_filter(), exceptions=self.collision_exceptions, detail=detail)
 
         if result:
+            #stop at the last step before the collision
+            self.x += (x/steps)*free_steps
+            self.y += (y/steps)*free_steps
+            self.last_collision = result
             return result
 
+        self.x += x
+        self.y += y
+
     def delete(self):
         if not self.deleted:
             if self.level:
                 self.level.entities.remove(self)
+                self.level.grid.remove(self)
+                self.level.remove_from_render_list(self)
         super().delete()
 
     def level_left(self):
@@ -125,8 +159,14 @@ class Entity(elements.Element):
         """
         pass
                 
+    def get_draw_rect(self):
+        """
+        Get the world-space area this entity draws over, for culling
+        """
+        return self.rect
+
     def draw(self):
         #g.camera.draw_rect("red", self.rect, 1)
         if self.gfx:
-            self.surface = gfx.get_surface(self.gfx)
+            self.update_surface()
             g.camera.draw_gfx(self.surface, self.rect.topleft)
\ No newline at end of file
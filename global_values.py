@@ -1,18 +1,41 @@
 import os
+import sys
 import pygame as p
 
 
+def get_arg(name, default=None):
+    """
+    Get the value following a command line flag, or default if it isn't given
+    """
+    if name in sys.argv:
+        index = sys.argv.index(name)+1
+        if index < len(sys.argv):
+            return sys.argv[index]
+    return default
+
+
 #obviously
 WIDTH = 64
 HEIGHT = 64
-FPS = 60
+FPS = int(get_arg("--fps", 60))  # render rate cap
 screen_rect = p.Rect(0,0,WIDTH,HEIGHT)
 
 #display
 screen = None
-SCREEN_WIDTH = 64*8
-SCREEN_HEIGHT = 64*8
+render_queue = None  # gfx.RenderQueue of blits to the screen
+WINDOW_SCALE = int(get_arg("--scale", 8))  # window size in screen pixels, can be changed with F9/F10
+# how the screen is fit to the window
+#   "stretch": scale to fill the window
+#   "integer": scale by a whole number only, with black bars around it
+#   "scaled": let pygame's SCALED display mode do the upscaling
+SCALE_MODE = get_arg("--scale-mode", "stretch")
+SCREEN_WIDTH = 64*WINDOW_SCALE
+SCREEN_HEIGHT = 64*WINDOW_SCALE
 full_screen = None
+present_rect = None  # where on the window the screen is shown
+present_surface = None  # part of the window the screen is scaled into
+PARTICLE_EMITTERS = 64  # particle bursts each level can have at once, the oldest are reused past this
+CULL_MARGIN = 16  # entities this far outside the view are still drawn, for arms, icons and rotated sprites
 
 #res
 RES_DIR = "res"
@@ -24,14 +47,24 @@ SOUNDS_DIR = os.path.join(RES_DIR, "sounds")
 
 #time
 game_clock = None
-dt = 0
+TICK_RATE = int(get_arg("--tick-rate", 60))  # simulation steps per second, independent of FPS
+MAX_TICKS_PER_FRAME = 5  # game will start slowing down if true FPS drops below TICK_RATE/MAX_TICKS_PER_FRAME
+dt = 1/TICK_RATE
+tick_accumulator = 0
+force_tick = False  # run a tick next frame even if none is due, so a new game is updated before it's drawn
+
+#how far between the last two ticks a frame is drawn, for interpolating positions
+INTERPOLATE = True
+INTERPOLATION_SNAP = 16  # moves bigger than this (teleports, doors) aren't interpolated
+frame_alpha = 1
 
 #obj
 elements = {}
 element_list = []
 levels = {}
 pipes = {}
-pipe_list = []
+active_pipes = {}  # pipes with actions to update, by name
+scheduler = None  # actions.Scheduler for timer actions
 element_id_number = 0
 global_pipe = None
 current_level = None
@@ -42,6 +75,12 @@ player = None
 end_screen = None
 inv_button = None
 
+#collision
+# each entity class gets a bit, and collision dicts are compiled into masks of these bits
+collision_categories = {}
+collision_filters = {}
+collision_filter_version = 0
+
 #input
 keys = {}
 mx = 0
@@ -50,19 +89,37 @@ ml, mm, mr = False, False, False
 tmx, tmy = 0,0
 player_targeting = False
 
+#headless
+# run without a window or audio device (soak tests, benchmarks)
+HEADLESS = "--headless" in sys.argv or os.environ.get("NECRO_HEADLESS") == "1"
+HEADLESS_FRAMES = None  # stop after this many frames, None runs forever
+input_source = None
+
 #debug stuff
 # enable "dev mode" commands if there's a gitignore file~
 IS_DEV = os.path.exists(".gitignore")
 if IS_DEV and False:
     print("IS_DEV is enabled.")
 NO_ATTACK = False  # makes enemies not attack
+profiler = None  # profiler.FrameProfiler, F3 shows its overlay
 
 #graphics
 spritesheets = {}
 image_cache = {}
 reverse_image_cache = {}
-mask_cache = {}
+frame_ids = {}  # spritesheet frame surface -> (sheet name, row, col, flip_h, flip_v)
+mask_cache = {}  # frame id (or surface, flip_h, flip_v) -> mask
+flip_cache = {}  # (surface, flip_h, flip_v) -> flipped surface, for surfaces that aren't spritesheet frames
+ROTATION_STEPS = 128  # rotated graphics snap to this many directions
+ROTATION_CACHE_SIZE = 256
+rotation_cache = None  # util.LRUCache of (surface, xflip, yflip, direction) -> rotated surface
 fonts = {}
+TEXT_CACHE_SIZE = 512
+text_cache = None  # util.LRUCache of (font name, string, colour) -> (rendered text, size)
+TEXT_LAYOUT_CACHE_SIZE = 64
+text_layout_cache = None  # util.LRUCache of (font name, string, width, spacing) -> wrapped lines
+USE_BITMAP_FONTS = "--bitmap-fonts" in sys.argv  # draw text from pre-rendered glyph atlases
+bitmap_fonts = {}
 
 # respect the palette >:(
 colour_remaps = {
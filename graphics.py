@@ -3,6 +3,7 @@ import math
 import os
 
 import global_values as g
+import utilities as util
 
 class Spritesheet:
     """
@@ -16,6 +17,7 @@ class Spritesheet:
 
         self.anims = []
         self.masks = []
+        self.flipped = {}  # (row, col, flip_h, flip_v) -> flipped frame, made on first use
         for y in range( int(self.surface.get_height()//sy) ):
             self.anims.append([])
             self.masks.append([])
@@ -31,11 +33,27 @@ class Spritesheet:
 
                 g.image_cache[cache_name] = new_surface
                 g.reverse_image_cache[new_surface] = SurfacePickle(new_surface, cache_name)
+                g.frame_ids[new_surface] = (self.name, y, x, False, False)
 
         print(self.name,":",int(self.surface.get_width()//sx), int(self.surface.get_height()//sy))
 
         g.spritesheets[self.name] = self
 
+    def get_flipped_frame(self, row, col, flip_h=False, flip_v=False):
+        """
+        Get a frame flipped horizontally and/or vertically, creating it the first time
+        """
+        if not flip_h and not flip_v:
+            return self.anims[row][col]
+
+        key = (row, col, flip_h, flip_v)
+        surf = self.flipped.get(key, None)
+        if surf is None:
+            surf = p.transform.flip(self.anims[row][col], flip_h, flip_v)
+            self.flipped[key] = surf
+            g.frame_ids[surf] = (self.name, row, col, flip_h, flip_v)
+        return surf
+
     def create_animation(self, index, timer, ping_pong=False, global_time=True, repeat=True, reverse=False):
         """
         Create animation from specific index
@@ -79,9 +97,9 @@ class Animation:
     def reset(self):
         self.start_update_time = p.time.get_ticks()
 
-    def get_frame(self):
+    def get_frame(self, flip_h=False, flip_v=False):
         """
-        Get the current displayed frame
+        Get the current displayed frame, optionally flipped
         """
         if self.ping_pong:
             frame_count = (len(self.frames)*2)-1
@@ -116,7 +134,10 @@ class Animation:
             else:
                 frame_index = len(self.frames)-int(frame_index+1)
 
-        return self.frames[int(frame_index)]
+        frame = self.frames[int(frame_index)]
+        if flip_h or flip_v:
+            frame = get_flipped(frame, flip_h, flip_v)
+        return frame
 
     def __getstate__(self):
         print("ANIMATION")
@@ -151,8 +172,8 @@ class AnimationSystem:
             self.playing_anim.start_update_time = p.time.get_ticks()
 
 
-    def get_frame(self):
-        return self.playing_anim.get_frame()
+    def get_frame(self, flip_h=False, flip_v=False):
+        return self.playing_anim.get_frame(flip_h, flip_v)
 
     def __getstate__(self):
         print("ANIMATION SYSTEM")
@@ -206,6 +227,44 @@ def get_surface(gfx):
     print("warning, cannot find: ",gfx)
     return None
 
+def get_flipped(surface, flip_h=False, flip_v=False):
+    """
+    Get a surface flipped horizontally and/or vertically, only flipping it the first time
+    """
+    if not flip_h and not flip_v:
+        return surface
+
+    frame_id = g.frame_ids.get(surface, None)
+    if frame_id:
+        sheet_name, row, col, frame_flip_h, frame_flip_v = frame_id
+        return g.spritesheets[sheet_name].get_flipped_frame(row, col, frame_flip_h != flip_h, frame_flip_v != flip_v)
+
+    key = (surface, flip_h, flip_v)
+    surf = g.flip_cache.get(key, None)
+    if surf is None:
+        surf = p.transform.flip(surface, flip_h, flip_v)
+        g.flip_cache[key] = surf
+    return surf
+
+def get_rotated(surface, angle, xflip=False, yflip=False):
+    """
+    Get a surface flipped and rotated to the nearest of g.ROTATION_STEPS directions, from cache if possible
+    Returns the rotated surface and the angle it was actually rotated by
+    """
+    if g.rotation_cache is None:
+        g.rotation_cache = util.LRUCache(g.ROTATION_CACHE_SIZE)
+
+    direction = round(angle/(math.pi*2) * g.ROTATION_STEPS) % g.ROTATION_STEPS
+    snapped_angle = direction * (math.pi*2) / g.ROTATION_STEPS
+
+    key = (surface, xflip, yflip, direction)
+    rotated_surface = g.rotation_cache.get(key)
+    if rotated_surface is None:
+        rotated_surface = p.transform.rotate(get_flipped(surface, xflip, yflip), math.degrees(-snapped_angle))
+        g.rotation_cache.set(key, rotated_surface)
+
+    return rotated_surface, snapped_angle
+
 def get_surface_hash(surface):
     """
     Hash a surface
@@ -280,31 +339,184 @@ def unpickle_state(_state_dict):
     return state_dict
 
 
-def get_mask(gfx):
+def get_frame_mask(frame_id):
+    """
+    Get the mask for a spritesheet frame, creating flipped versions the first time they're needed
     """
-    Get the mask from some surface, or create it if it doesn't exist
+    sheet_name, row, col, flip_h, flip_v = frame_id
+    sheet = g.spritesheets[sheet_name]
+    if not flip_h and not flip_v:
+        return sheet.masks[row][col]
+
+    mask = g.mask_cache.get(frame_id, None)
+    if not mask:
+        mask = p.mask.from_surface(p.transform.flip(sheet.anims[row][col], flip_h, flip_v))
+        g.mask_cache[frame_id] = mask
+    return mask
+
+def get_mask(gfx, flip_h=False, flip_v=False):
+    """
+    Get the mask from some surface (drawn flipped or not), or create it if it doesn't exist
     """
     surf = get_surface(gfx)
-    surf_hash = get_surface_hash(surf)
-    res = g.mask_cache.get(surf_hash, None)
+    frame_id = g.frame_ids.get(surf, None)
+    if frame_id:
+        sheet_name, row, col, frame_flip_h, frame_flip_v = frame_id
+        return get_frame_mask((sheet_name, row, col, frame_flip_h != flip_h, frame_flip_v != flip_v))
+
+    key = (surf, flip_h, flip_v)
+    res = g.mask_cache.get(key, None)
     if res:
         return res
     else:
         #create new
+        if flip_h or flip_v:
+            surf = p.transform.flip(surf, flip_h, flip_v)
         mask = p.mask.from_surface(surf)
-        g.mask_cache[surf_hash] = mask
+        g.mask_cache[key] = mask
         return mask
 
+class RenderQueue:
+    """
+    Class for collecting blits to the screen, so they can all be done at once with Surface.blits
+    Anything drawing to the screen some other way should flush the queue first, to keep things in order
+    """
+    def __init__(self):
+        self.blits = []
+
+    def add(self, surface, dest, area=None, flags=0):
+        """
+        Queue a blit, with dest already in screen space
+        """
+        if area is None and not flags:
+            self.blits.append((surface, dest))
+        else:
+            self.blits.append((surface, dest, area, flags))
+
+    def flush(self):
+        """
+        Do all the queued blits
+        """
+        if self.blits:
+            g.screen.blits(self.blits, doreturn=False)
+            self.blits.clear()
+
+class BitmapFont:
+    """
+    Class for a font with its glyphs rendered once into an atlas, drawn by blitting parts of the atlas
+    Glyphs are placed by their own advances, but strings are measured by the font so layout matches normal text
+    """
+    def __init__(self, font, characters=None):
+        if characters is None:
+            characters = "".join(chr(i) for i in range(32, 127))
+
+        self.font = font
+        self.height = font.size(" ")[1]
+        self.advances = {}
+        self.offsets = {}
+        self.areas = {}
+
+        #white glyphs side by side
+        glyphs = []
+        atlas_w = 0
+        for character, metrics in zip(characters, font.metrics(characters)):
+            glyph = font.render(character, False, (255,255,255))
+            #the size of a single character is rounded, so doesn't add up to the size of a string
+            if metrics:
+                self.advances[character] = metrics[4]
+                #a glyph rendered alone starts at its ink, so one that hangs left of its pen position has to be moved back
+                self.offsets[character] = min(metrics[0], 0)
+            else:
+                self.advances[character] = font.size(character)[0]
+                self.offsets[character] = 0
+            self.areas[character] = p.Rect(atlas_w, 0, glyph.get_width(), glyph.get_height())
+            glyphs.append((glyph, (atlas_w, 0)))
+            atlas_w += glyph.get_width()
+
+        self.atlas = p.Surface((max(atlas_w, 1), self.height), p.SRCALPHA)
+        self.atlas.fill((0,0,0,0))
+        self.atlas.blits(glyphs, doreturn=False)
+
+        #an atlas for every palette colour
+        self.colour_atlases = {}
+        for colour in set(g.colour_remaps.values()):
+            self.get_colour_atlas(colour)
+
+    def get_colour_atlas(self, colour):
+        atlas = self.colour_atlases.get(colour, None)
+        if atlas is None:
+            atlas = self.atlas.copy()
+            rgb = p.Color(colour)
+            atlas.fill((rgb.r, rgb.g, rgb.b, 255), special_flags=p.BLEND_RGBA_MULT)
+            self.colour_atlases[colour] = atlas
+        return atlas
+
+    def can_draw(self, string):
+        return all(character in self.areas for character in string)
+
+    def size(self, string):
+        return self.font.size(string)
+
+    def draw(self, surface, string, pos, colour, alpha=255):
+        atlas = self.get_colour_atlas(colour)
+        if atlas.get_alpha() != alpha:
+            atlas.set_alpha(alpha)
+
+        x, y = pos
+        blits = []
+        if string:
+            #a rendered string is moved right so its first glyph doesn't hang off the left
+            x -= self.offsets[string[0]]
+        for character in string:
+            blits.append((atlas, (x+self.offsets[character], y), self.areas[character]))
+            x += self.advances[character]
+        surface.blits(blits, doreturn=False)
+
+def get_bitmap_font(font_name, string):
+    """
+    Get the bitmap font to draw a string with, or None if it should be drawn normally
+    """
+    if not g.USE_BITMAP_FONTS:
+        return None
+    bitmap_font = g.bitmap_fonts.get(font_name, None)
+    if bitmap_font and bitmap_font.can_draw(string):
+        return bitmap_font
+    return None
+
+def get_text_size(font_name, string):
+    bitmap_font = get_bitmap_font(font_name, string)
+    if bitmap_font:
+        return bitmap_font.size(string)
+    return g.fonts[font_name].size(string)
+
+def get_text(font_name, string, colour):
+    """
+    Get some rendered text and its size, from cache if possible
+    """
+    if g.text_cache is None:
+        g.text_cache = util.LRUCache(g.TEXT_CACHE_SIZE)
+
+    key = (font_name, string, colour)
+    text = g.text_cache.get(key)
+    if text is None:
+        font = g.fonts[font_name]
+        text = (font.render(string, False, colour), font.size(string))
+        g.text_cache.set(key, text)
+    return text
+
 def draw_text(font_name, string, pos, cx=False, cy=False, colour=g.convert_colour("black"), alpha=255):
     """
     Draw some text
     """
-    font = g.fonts[font_name]
     colour = g.convert_colour(colour)
-    
-    health_text = font.render(string, False, colour)
+    g.render_queue.flush()
+
+    bitmap_font = get_bitmap_font(font_name, string)
+    if bitmap_font:
+        w,h = bitmap_font.size(string)
+    else:
+        health_text, (w,h) = get_text(font_name, string, colour)
 
-    w,h = font.size(string)
     x = pos[0]
     y = pos[1]
     if cx:
@@ -312,41 +524,64 @@ def draw_text(font_name, string, pos, cx=False, cy=False, colour=g.convert_colou
     if cy:
         y -= h/2
 
-    if alpha != 255:
+    if bitmap_font:
+        bitmap_font.draw(g.screen, string, (x, y), colour, alpha)
+        return
+
+    #the rendered text is shared, so alpha is set for every blit
+    if health_text.get_alpha() != alpha:
         health_text.set_alpha(alpha)
 
     g.screen.blit(health_text, (x, y))
 
-def draw_wrapped_text(font_name, string, rect, colour=g.convert_colour("black"), alpha=255, spacing=None):
+def get_wrapped_lines(font_name, string, width, spacing=None):
+    """
+    Split some text into lines no wider than width, from cache if possible
+    Returns a list of (line, y offset, height)
+    """
+    if g.text_layout_cache is None:
+        g.text_layout_cache = util.LRUCache(g.TEXT_LAYOUT_CACHE_SIZE)
+
+    key = (font_name, string, width, spacing)
+    lines = g.text_layout_cache.get(key)
+    if lines is not None:
+        return lines
+
     words = string.split(" ")
-    font = g.fonts[font_name]
-    colour = g.convert_colour(colour)
-    x = rect.x
-    y = rect.y
+    lines = []
+    y = 0
     line = ""
     for word in words:
         if word == "":
             word = " "
 
-        w,h = font.size(line+" "+word)
-        if w > rect.w or "\n" in word:
-            #draw line
-            if y+h > rect.y:
-                draw_text(font_name, line, (x,y), colour=colour, alpha=alpha)
+        w,h = get_text_size(font_name, line+" "+word)
+        if w > width or "\n" in word:
+            lines.append((line, y, h))
 
             line = word
-            x = rect.x
             if spacing:
                 y += spacing
             else:
                 y += h
-            #if y > rect.bottom:
-            #    return
         else:
             line += " "+word
 
+    if line:
+        lines.append((line, y, h))
 
+    g.text_layout_cache.set(key, lines)
+    return lines
 
-    if line:
-        draw_text(font_name, line, (x,y), colour=colour, alpha=alpha)
+def draw_wrapped_text(font_name, string, rect, colour=g.convert_colour("black"), alpha=255, spacing=None):
+    colour = g.convert_colour(colour)
+    clip = g.screen.get_clip()
+    for line, y, h in get_wrapped_lines(font_name, string, rect.w, spacing):
+        y += rect.y
+
+        #only draw lines which can be seen
+        if y >= clip.bottom:
+            break
+        if y+h > clip.top and line:
+            draw_text(font_name, line, (rect.x,y), colour=colour, alpha=alpha)
 
@@ -0,0 +1,111 @@
+import pygame as p
+import json
+
+import global_values as g
+
+class PygameInput:
+    """
+    Input source reading from the real keyboard and mouse
+    """
+    def get_events(self):
+        return p.event.get()
+
+    def get_keys(self):
+        return p.key.get_pressed()
+
+    def get_mouse_buttons(self):
+        return p.mouse.get_pressed()
+
+    def get_mouse_pos(self):
+        return p.mouse.get_pos()
+
+class ScriptedKeys:
+    """
+    Stand-in for pygame's pressed key list
+    """
+    def __init__(self, held):
+        self.held = held
+
+    def __getitem__(self, key):
+        return key in self.held
+
+class ScriptedInput:
+    """
+    Input source which replays a script of inputs, for running without a display
+
+    The script is a list of dicts, each with a "frame" and one of:
+        "key_down" / "key_up": key name, as used by pygame.key.key_code
+        "mouse_pos": (x, y) in window coordinates
+        "mouse_down" / "mouse_up": mouse button number
+        "wheel": scroll amount
+        "quit": true
+    """
+    def __init__(self, script=()):
+        self.frame = 0
+        self.script = {}
+        for entry in script:
+            self.script.setdefault(entry["frame"], []).append(entry)
+
+        self.held_keys = set()
+        self.mouse_buttons = [False, False, False]
+        self.mouse_pos = (g.SCREEN_WIDTH//2, g.SCREEN_HEIGHT//2)
+
+    def get_events(self):
+        """
+        Get the events for the next frame
+        """
+        #keep the real event queue drained
+        p.event.pump()
+
+        events = []
+        for entry in self.script.get(self.frame, []):
+            if "key_down" in entry:
+                key = p.key.key_code(entry["key_down"])
+                self.held_keys.add(key)
+                events.append(p.event.Event(p.KEYDOWN, key=key))
+
+            elif "key_up" in entry:
+                key = p.key.key_code(entry["key_up"])
+                self.held_keys.discard(key)
+                events.append(p.event.Event(p.KEYUP, key=key))
+
+            elif "mouse_pos" in entry:
+                self.mouse_pos = tuple(entry["mouse_pos"])
+                events.append(p.event.Event(p.MOUSEMOTION, pos=self.mouse_pos))
+
+            elif "mouse_down" in entry:
+                button = entry["mouse_down"]
+                if button <= 3:
+                    self.mouse_buttons[button-1] = True
+                events.append(p.event.Event(p.MOUSEBUTTONDOWN, button=button, pos=self.mouse_pos))
+
+            elif "mouse_up" in entry:
+                button = entry["mouse_up"]
+                if button <= 3:
+                    self.mouse_buttons[button-1] = False
+                events.append(p.event.Event(p.MOUSEBUTTONUP, button=button, pos=self.mouse_pos))
+
+            elif "wheel" in entry:
+                events.append(p.event.Event(p.MOUSEWHEEL, x=0, y=entry["wheel"]))
+
+            elif entry.get("quit"):
+                events.append(p.event.Event(p.QUIT))
+
+        self.frame += 1
+        return events
+
+    def get_keys(self):
+        return ScriptedKeys(self.held_keys)
+
+    def get_mouse_buttons(self):
+        return tuple(self.mouse_buttons)
+
+    def get_mouse_pos(self):
+        return self.mouse_pos
+
+def load_script(path):
+    """
+    Load an input script from a json file
+    """
+    with open(path) as script_file:
+        return json.loads(script_file.read())
@@ -1,9 +1,8 @@
 import global_values as g
 import graphics as gfx
-import entities
+import utilities as util
 import particles
 import creatures
-import levels
 import actions
 import sounds
 
@@ -139,20 +138,11 @@ class Gun(Item):
         for _ in range(self.projectiles):
             angle = self.holder.angle + ((r.random()-0.5)*self.spread)
 
-            bullet_rect = p.Rect(self.holder.rect.centerx, self.holder.rect.centery, 1, 1)
-            bullet_mask = p.mask.Mask((bullet_rect.w, bullet_rect.h), fill=True)
-            bullet_mask.fill()
+            result, (hit_x, hit_y), hit_level = util.raycast(self.holder.level, self.holder.rect.center, angle, self.range, exceptions=[self.holder])
 
-            bullet = entities.Entity(bullet_rect,
-            self.holder.level, collision_exceptions=[self.holder], solid=False, mask=bullet_mask)
-            target_x = self.holder.rect.centerx + m.cos(angle)*self.range
-            target_y = self.holder.rect.centery + m.sin(angle)*self.range
-
-            result = bullet.move_towards(target_x, target_y, self.range, detail=True)
-
-            if result:
+            if result or hit_level:
                 if isinstance(result, creatures.Creature):
-                    if bullet.y < result.rect.bottom-(result.rect.h*0.70):
+                    if hit_y < result.rect.bottom-(result.rect.h*0.70):
                         #boom, headshot
                         damage = self.damage*1.5
                         headshot = True
@@ -161,19 +151,17 @@ class Gun(Item):
                         headshot = False
 
                     if self.damage > 0:
-                        particles.create_blood(bullet.level, (bullet.x, bullet.y), self.holder.angle + m.pi ,headshot=headshot)
+                        particles.create_blood(self.holder.level, (hit_x, hit_y), self.holder.angle + m.pi ,headshot=headshot)
 
                     result.take_damage(damage, source=self.holder)
                     if self.stun:
                         result.stun(self.stun)
 
-                if isinstance(result, levels.Level) and self.damage:
-                                                                #level, position, angle, colour, spread, amount, power, timer
-                    particles.Particles(bullet.level, (bullet.x, bullet.y), self.holder.angle + m.pi, g.colour_remaps["beige"], 1, 5, 5, 10)
+                if hit_level and self.damage:
+                    particles.create_dust(self.holder.level, (hit_x, hit_y), self.holder.angle + m.pi)
 
             else:
                 pass
-            bullet.delete()
 
 #guns
 class Handgun(Gun):
@@ -4,12 +4,14 @@ import creatures
 import entities
 import controls
 import actions
+import broadphase
 import items
 import sounds
 
 import pygame as p
 import os
 import json
+import bisect
 
 class Level:
     def __init__(self, name):
@@ -29,6 +31,17 @@ class Level:
 
         self.structures = []
         self.entities = []
+        self.grid = broadphase.SpatialGrid()
+        self.particle_manager = None
+
+        #entities in drawing order, sorted by (z index, element id)
+        self.render_list = []
+        self.render_keys = []
+
+        #level image with the static structures drawn onto it
+        self.background = None
+        self.background_pos = (0, 0)
+        self.bake_key = None
         self.connected_levels = []
 
         for structure_dat in self.level_dat["structures"]:
@@ -65,10 +78,52 @@ class Level:
                 if structure.create_exit:
                     structure.create_exit_door()
 
+    def add_to_render_list(self, entity):
+        entity.render_key = (entity.z_index, entity.element_id)
+        index = bisect.bisect_right(self.render_keys, entity.render_key)
+        self.render_keys.insert(index, entity.render_key)
+        self.render_list.insert(index, entity)
+
+    def remove_from_render_list(self, entity):
+        index = bisect.bisect_left(self.render_keys, entity.render_key)
+        del self.render_keys[index]
+        del self.render_list[index]
+
+    def get_bake_key(self):
+        """
+        Get what every structure looks like, so the background can be baked again when any of them change
+        """
+        return tuple((structure, structure.get_bake_key()) for structure in self.structures)
+
+    def bake(self, x, y):
+        """
+        Draw the level image and all the static structures onto the background
+        """
+        blits = []
+        for structure, structure_key in self.bake_key:
+            structure.baked = structure_key is not None
+            if structure.baked:
+                blits += structure.get_bake_blits()
+
+        bounds = p.Rect(x, y, self.level_image.get_width(), self.level_image.get_height())
+        bounds = bounds.unionall([p.Rect(pos, surf.get_size()) for surf, pos in blits])
+
+        self.background = p.Surface(bounds.size, p.SRCALPHA)
+        self.background.fill((0,0,0,0))
+        self.background.blit(self.level_image, (x-bounds.x, y-bounds.y))
+        self.background.blits([(surf, (pos[0]-bounds.x, pos[1]-bounds.y)) for surf, pos in blits], doreturn=False)
+        self.background_pos = bounds.topleft
+
     def draw(self):
         x = self.rect.x + self.level_image_render_offset[0]
         y = self.rect.y = self.level_image_render_offset[1]
-        g.camera.draw_gfx(self.level_image, (x, y))
+
+        bake_key = self.get_bake_key()
+        if bake_key != self.bake_key:
+            self.bake_key = bake_key
+            self.bake(x, y)
+
+        g.camera.draw_gfx(self.background, self.background_pos)
 
     def __getstate__(self):
         print("LEVEL")
@@ -88,6 +143,7 @@ def change_level(new_level, show_text=True):
     if g.current_level:
         g.current_level.level_entered()
         for entity in g.current_level.entities:
+            entity.store_previous_position()
             entity.level_entered()
 
     if show_text:
@@ -102,6 +158,7 @@ class Structure(entities.Entity):
 
         self.interaction_enabled = interaction_enabled
         self.can_interact = False
+        self.baked = False  # drawn as part of the level background
         self.level.structures.append(self)
         
     def update(self):
@@ -115,15 +172,46 @@ class Structure(entities.Entity):
         else:
             self.can_interact = False
 
+    def get_icon_pos(self, icon_surf):
+        icon_x = self.rect.centerx - icon_surf.get_width() // 2
+        icon_y = self.rect.y - icon_surf.get_height() - 3
+        return (icon_x, icon_y)
+
+    def get_icon_name(self):
+        return "interact_icon" if self.rect.width % 2 == 1 else "interact_icon_large"
+
+    def get_bake_key(self):
+        """
+        Get what this structure looks like, or None if it changes by itself and can't be baked into the level background
+        """
+        if self.z_index > 0 or self.visible_override is False or isinstance(self.gfx, (gfx.Animation, gfx.AnimationSystem)):
+            return None
+        surf = gfx.get_surface(self.gfx) if self.gfx else None
+        return (surf, self.rect.topleft, self.can_interact)
+
+    def get_bake_blits(self):
+        """
+        Get the surfaces and positions this structure draws when it's baked into the level background
+        """
+        blits = []
+        if self.gfx:
+            blits.append((gfx.get_surface(self.gfx), self.rect.topleft))
+
+        if self.can_interact:
+            icon_surf = gfx.get_surface(self.get_icon_name())
+            blits.append((icon_surf, self.get_icon_pos(icon_surf)))
+        return blits
+
     def draw(self):
+        if self.baked:
+            return
+
         g.camera.draw_gfx(self.gfx, self.rect.topleft)
 
         if self.can_interact:
-            icon_name = "interact_icon" if self.rect.width % 2 == 1 else "interact_icon_large"
+            icon_name = self.get_icon_name()
             icon_surf = gfx.get_surface(icon_name)
-            icon_x = self.rect.centerx - icon_surf.get_width() // 2
-            icon_y = self.rect.y - icon_surf.get_height() - 3
-            g.camera.draw_gfx(icon_name, (icon_x, icon_y))
+            g.camera.draw_gfx(icon_name, self.get_icon_pos(icon_surf))
 
     def delete(self):
         if not self.deleted:
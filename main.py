@@ -4,6 +4,7 @@ import pygame as p
 import random
 import asyncio
 import os
+import sys
 
 import levels
 import cameras
@@ -12,20 +13,45 @@ import controls
 import entities
 import actions
 import sounds
+import inputs
+import profiler
+import presentation
 
 import platform
+import time
 if platform.system().lower() == "emscripten":
     platform.window.onbeforeunload = None
 
+if g.HEADLESS:
+    #dummy drivers have to be picked before the display and mixer start
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    script_path = g.get_arg("--script")
+    g.input_source = inputs.ScriptedInput(inputs.load_script(script_path) if script_path else ())
+    frames = g.get_arg("--frames")
+    if frames is not None:
+        g.HEADLESS_FRAMES = int(frames)
+else:
+    g.input_source = inputs.PygameInput()
+
+g.profiler = profiler.FrameProfiler()
+if "--profile" in sys.argv:
+    g.profiler.enabled = True
+
 p.mixer.init()
 sounds.load_sounds()
 g.channel_list = sounds.ChannelList()
 p.mixer.music.set_volume(0.5)
 
+g.scheduler = actions.Scheduler()
 g.global_pipe = actions.Pipe("global")
 
 g.screen = p.Surface((g.WIDTH, g.HEIGHT))
-g.full_screen = p.display.set_mode((g.SCREEN_WIDTH, g.SCREEN_HEIGHT))
+g.render_queue = gfx.RenderQueue()
+presentation.setup_display()
+#scaling straight into the window needs the screen in the window's pixel format
+g.screen = g.screen.convert()
 
 gfx.Spritesheet("player_ss", 16,32)
 gfx.Spritesheet("basic_enemy_ss", 16,32)
@@ -46,6 +72,9 @@ p.font.init()
 g.fonts = {
     "font1_1":p.font.Font(os.path.join(g.FONTS_DIR, "Lo-Res 9 Narrow.ttf"), 9)
 }
+if g.USE_BITMAP_FONTS:
+    for font_name, font in g.fonts.items():
+        g.bitmap_fonts[font_name] = gfx.BitmapFont(font)
 
 g.game_clock = p.time.Clock()
 
@@ -61,6 +90,7 @@ def start_game():
     reset()
     p.mixer.music.fadeout(500)
     g.active_states = set(("main",))
+    g.force_tick = True
     g.current_level = g.levels["Cryo I"]
     levels.change_level(g.current_level, show_text=False)
 
@@ -232,10 +262,13 @@ def handle_input():
                 g.player_targeting = True
                 g.player.set_target_x(g.tmx)
 
-    for event in p.event.get():
+    for event in g.input_source.get_events():
         if event.type == p.QUIT:
             RUNNING = False
 
+        elif event.type == p.VIDEORESIZE:
+            presentation.resize_window(event.size)
+
         if event.type == p.MOUSEBUTTONDOWN:
             if event.button == 3:
                 interact()
@@ -283,6 +316,16 @@ def handle_input():
                 if not button_pressed:
                     interact(closest=True)
 
+            #profiler overlay
+            elif event.key == p.K_F3:
+                g.profiler.toggle_overlay()
+
+            #window scale
+            elif event.key == p.K_F9:
+                presentation.set_window_scale(g.WINDOW_SCALE-1)
+            elif event.key == p.K_F10:
+                presentation.set_window_scale(g.WINDOW_SCALE+1)
+
             #select item
             elif p.K_1 <= event.key <= p.K_9:
                 if "main" in g.active_states or "inventory" in g.active_states:
@@ -296,15 +339,17 @@ def handle_input():
                 else:
                     text.scroll_down()
 
-    g.keys = p.key.get_pressed()
-    g.ml, g.mm, g.mr = p.mouse.get_pressed()
-    g.mx, g.my = p.mouse.get_pos()
-    g.mx *= (g.WIDTH/g.SCREEN_WIDTH)
-    g.my *= (g.HEIGHT/g.SCREEN_HEIGHT)
+    g.keys = g.input_source.get_keys()
+    g.ml, g.mm, g.mr = g.input_source.get_mouse_buttons()[:3]
+    g.mx, g.my = presentation.window_to_screen(g.input_source.get_mouse_pos())
 
     g.tmx = g.mx + g.camera.x
     g.tmy = g.my + g.camera.y
 
+def apply_held_input():
+    """
+    Apply input that acts continuously, once per simulation tick
+    """
     if g.keys[p.K_a]:
         g.player.move(-g.player.speed*g.dt, 0)
         if g.player.target_x:
@@ -321,6 +366,19 @@ def handle_input():
     else:
         g.player_targeting = False
 
+def tick():
+    """
+    Run one fixed-length simulation step
+    """
+    g.force_tick = False
+    g.camera.store_previous_position()
+    if g.current_level:
+        for entity in g.current_level.entities:
+            entity.store_previous_position()
+
+    apply_held_input()
+    update()
+
 def update():
     #check if player is dead
     if g.player.fully_dead and "gameover" not in g.active_states:
@@ -329,41 +387,52 @@ def update():
         p.mixer.music.fadeout(500)
         g.current_level = None
         
-    i = 0
-    while i < len(g.pipe_list):
-        g.pipe_list[i].update()
-        i += 1
+    g.profiler.start("pipes")
+    g.scheduler.update()
+    for pipe in list(g.active_pipes.values()):
+        pipe.update()
+    g.profiler.stop("pipes")
 
+    g.profiler.start("channels")
     g.channel_list.update()
+    g.profiler.stop("channels")
 
+    g.profiler.start("elements")
     in_main = "main" in g.active_states
-    for element in g.element_list:
-        if isinstance(element, entities.Entity):
-            if in_main:
-                if element.level == g.current_level:
-                    element.update()
-                else:
-                    element.update_inactive()
+    if g.profiler.current is not None:
+        for element in g.element_list:
+            start_time = time.perf_counter()
+            update_element(element, in_main)
+            g.profiler.add_class_time(element.__class__.__name__, "update", time.perf_counter()-start_time)
+    else:
+        for element in g.element_list:
+            update_element(element, in_main)
+    g.profiler.stop("elements")
+
+def update_element(element, in_main):
+    """
+    Update a single element, depending on its type and the game state
+    """
+    if isinstance(element, entities.Entity):
+        if in_main:
+            if element.level == g.current_level:
+                element.update()
             else:
-                continue
+                element.update_inactive()
 
-        elif isinstance(element, controls.Control):
-            if g.active_states.isdisjoint(element.active_states):
-                element.active = False
-                continue
-                
-            else:
-                element.active = True
-                element.update()
-            
+    elif isinstance(element, controls.Control):
+        if g.active_states.isdisjoint(element.active_states):
+            element.active = False
         else:
+            element.active = True
             element.update()
 
-def sort_entity(entity):
-    index = entity.z_index
-    return index
+    else:
+        element.update()
 
 def draw():
+    g.camera.begin_draw(g.frame_alpha)
+
     if "main" in g.active_states:
         if g.current_level:
             if g.current_level.show_space:
@@ -373,44 +442,112 @@ def draw():
         if g.current_level:
             g.current_level.draw()
 
-            for entity in sorted(g.elements.get("class_Entity", []), key=sort_entity):
-                if entity.level != g.current_level:
-                    continue
-
+            view_rect = g.camera.get_view_rect(g.CULL_MARGIN)
+            culled = 0
+            drawn = 0
+            for entity in g.current_level.render_list:
                 if entity.visible_override is not False:
-                    entity.draw()
+                    #skip anything off screen
+                    if not view_rect.colliderect(entity.get_draw_rect()):
+                        culled += 1
+                        continue
+
+                    g.camera.set_element_offset(entity.get_interpolation_offset(g.frame_alpha))
+                    draw_element(entity)
+                    drawn += 1
+            g.camera.set_element_offset((0, 0))
+            g.render_queue.flush()
+
+            g.profiler.count("culled", culled)
+            g.profiler.count("drawn", drawn)
 
     for control in g.elements.get("class_Control", []):
         if (control.visible_override is not False) and not g.active_states.isdisjoint(control.active_states) and not isinstance(control, controls.BackgroundControl):
-            control.draw()
+            draw_element(control)
+    g.render_queue.flush()
 
-    for pipe in g.pipes.values():
+    for pipe in g.active_pipes.values():
         pipe.draw()
+    g.render_queue.flush()
+
+def draw_element(element):
+    """
+    Draw a single element, timing it if the profiler is recording
+    """
+    if g.profiler.current is not None:
+        start_time = time.perf_counter()
+        element.draw()
+        g.profiler.add_class_time(element.__class__.__name__, "draw", time.perf_counter()-start_time)
+    else:
+        element.draw()
+
+
+def run_frame():
+    """
+    Run a single frame of input, simulation and drawing, without presenting it
+    """
+    g.screen.fill(g.convert_colour("black"))
+    g.profiler.start("input")
+    handle_input()
+    g.profiler.stop("input")
+
+    g.profiler.start("update")
+    ticks = 0
+    while (g.tick_accumulator >= g.dt or g.force_tick) and ticks < g.MAX_TICKS_PER_FRAME:
+        tick()
+        g.tick_accumulator = max(g.tick_accumulator-g.dt, 0)
+        ticks += 1
+    g.profiler.stop("update")
+    if ticks == g.MAX_TICKS_PER_FRAME:
+        #too far behind to catch up, drop the backlog instead of spiralling
+        g.tick_accumulator = min(g.tick_accumulator, g.dt)
+
+    if g.INTERPOLATE:
+        g.frame_alpha = g.tick_accumulator/g.dt
+    else:
+        g.frame_alpha = 1
 
+    g.profiler.start("draw")
+    draw()
+    g.profiler.stop("draw")
+    g.profiler.draw_overlay()
 
 go_to_menu()
+if g.HEADLESS and "--start" in sys.argv:
+    start_game()
+
 RUNNING = True
 async def main():
-    
+    frame_count = 0
     while RUNNING:
-        g.screen.fill(g.convert_colour("black"))
-        handle_input()
-        update()
-        draw()
+        g.profiler.begin_frame()
+        run_frame()
+
+        if g.HEADLESS:
+            #no presentation, and no frame cap; exactly one tick per frame
+            g.game_clock.tick()
+            g.tick_accumulator += g.dt
+        else:
+            #upscale and display
+            g.profiler.start("present")
+            presentation.present()
+            g.profiler.stop("present")
 
-        #upscale and display
-        g.full_screen.blit(p.transform.scale(g.screen, (g.SCREEN_WIDTH, g.SCREEN_HEIGHT)), (0,0))
-        p.display.flip()
+            await asyncio.sleep(0)
 
-        await asyncio.sleep(0)
+            g.tick_accumulator += g.game_clock.tick(g.FPS) / 1000
 
-        g.dt = g.game_clock.tick(g.FPS) / 1000
-        g.dt = min(0.0333, g.dt)  # game will start slowing down if true FPS drops below 20
+        g.profiler.end_frame()
+        frame_count += 1
+        if g.HEADLESS_FRAMES is not None and frame_count >= g.HEADLESS_FRAMES:
+            break
 
 
     def quit_game():
+        profile_path = g.get_arg("--profile-out")
+        if profile_path:
+            g.profiler.dump(profile_path)
         p.display.quit()
-        import sys
         sys.exit()
     quit_game()
 
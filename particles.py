@@ -5,10 +5,29 @@ import pygame as p
 import math as m
 import random as r
 
-class Particles(entities.Entity):
-    def __init__(self, level, position, angle, colour, spread, amount, power, timer,
+#numpy is optional, particles are updated one at a time without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class Emitter:
+    """
+    Class for a single burst of particles, kept in a ParticleManager's pool and reused
+    """
+    def __init__(self):
+        self.active = False
+        self.x = 0
+        self.y = 0
+        self.amount = 0
+
+    def start(self, position, angle, colour, spread, amount, power, timer,
     gravity=1, size=1):
-        super().__init__(p.Rect(position[0], position[1], 1, 1), level, solid=False)
+        """
+        Start a new burst of particles from this emitter
+        """
+        self.active = True
+        self.x, self.y = position
 
         self.position = position
         self.angle = angle
@@ -23,7 +42,16 @@ class Particles(entities.Entity):
         self.timer = timer
         self.creation_time = p.time.get_ticks()
 
-        #TODO: do this with numpy
+        if np is not None:
+            angles = self.angle + ((np.random.random(self.amount)-0.5)*self.spread)
+            powers = np.random.random(self.amount)*self.power
+
+            self.particle_x = np.zeros(self.amount)
+            self.particle_y = np.ones(self.amount)
+            self.particle_vx = np.cos(angles) * powers
+            self.particle_vy = np.sin(angles) * powers
+            return
+
         self.particle_x = []
         self.particle_y = []
         self.particle_vx = []
@@ -42,25 +70,144 @@ class Particles(entities.Entity):
             self.particle_vy.append(vy)
 
     def update(self):
-        for i in range(self.amount):
-            self.particle_vx[i] -= self.particle_vx[i]*(1-0.8)*g.dt
+        if np is not None:
+            self.particle_vx -= self.particle_vx*(1-0.8)*g.dt
+
+            self.particle_vy += 9.8*g.dt*self.gravity
+            self.particle_vy -= self.particle_vy*(1-0.8)*g.dt
+
+            self.particle_x += self.particle_vx*g.dt
+            self.particle_y += self.particle_vy*g.dt
+        else:
+            for i in range(self.amount):
+                self.particle_vx[i] -= self.particle_vx[i]*(1-0.8)*g.dt
 
-            self.particle_vy[i] += 9.8*g.dt*self.gravity
-            self.particle_vy[i] -= self.particle_vy[i]*(1-0.8)*g.dt
-            
-            self.particle_x[i] += self.particle_vx[i]*g.dt
-            self.particle_y[i] += self.particle_vy[i]*g.dt
+                self.particle_vy[i] += 9.8*g.dt*self.gravity
+                self.particle_vy[i] -= self.particle_vy[i]*(1-0.8)*g.dt
+                
+                self.particle_x[i] += self.particle_vx[i]*g.dt
+                self.particle_y[i] += self.particle_vy[i]*g.dt
 
-            if (p.time.get_ticks()-self.creation_time)/1000 > self.timer:
-                self.delete()
+    def is_expired(self):
+        return (p.time.get_ticks()-self.creation_time)/1000 > self.timer
                 
+    def get_draw_rect(self):
+        if not self.amount:
+            return p.Rect(self.x, self.y, 0, 0)
+        if np is not None:
+            min_x, max_x = self.particle_x.min(), self.particle_x.max()
+            min_y, max_y = self.particle_y.min(), self.particle_y.max()
+        else:
+            min_x, max_x = min(self.particle_x), max(self.particle_x)
+            min_y, max_y = min(self.particle_y), max(self.particle_y)
+        left = self.x + min_x - self.size
+        top = self.y + min_y - self.size
+        right = self.x + max_x + self.size + 1
+        bottom = self.y + max_y + self.size + 1
+        return p.Rect(left, top, right-left, bottom-top)
+
     def draw(self):
+        #pixels2d can't reference 24 bit surfaces
+        if np is not None and self.size == 1 and g.screen.get_bitsize() != 24:
+            self.draw_pixels()
+            return
+
         for i in range(self.amount):
             if self.size == 1:
                 g.camera.set_at( (self.x+self.particle_x[i], self.y+self.particle_y[i]), self.colour) 
             else:
                 g.camera.draw_circle(self.colour, (self.x+self.particle_x[i], self.y+self.particle_y[i]), self.size)
 
+    def draw_pixels(self):
+        """
+        Draw every particle on screen as a single pixel, all at once
+        """
+        g.render_queue.flush()
+
+        origin_x, origin_y = g.camera.transform_point((self.x, self.y))
+        xs = (origin_x + self.particle_x).astype(int)
+        ys = (origin_y + self.particle_y).astype(int)
+
+        width, height = g.screen.get_size()
+        on_screen = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+
+        pixels = p.surfarray.pixels2d(g.screen)
+        pixels[xs[on_screen], ys[on_screen]] = g.screen.map_rgb(g.convert_colour(self.colour))
+        del pixels
+
+class ParticleManager(entities.Entity):
+    """
+    Entity which updates and draws all the particles in a level, from a fixed pool of emitters
+    """
+    def __init__(self, level, capacity=None):
+        super().__init__(p.Rect(0, 0, 1, 1), level, solid=False)
+
+        if capacity is None:
+            capacity = g.PARTICLE_EMITTERS
+        self.emitters = [Emitter() for _ in range(capacity)]
+        self.free_emitters = self.emitters[::-1]
+        self.active_emitters = []
+
+    def emit(self, *args, **kwargs):
+        """
+        Start a burst of particles, reusing the oldest burst if the pool is full
+        """
+        if self.free_emitters:
+            emitter = self.free_emitters.pop()
+        else:
+            emitter = self.active_emitters.pop(0)
+
+        emitter.start(*args, **kwargs)
+        self.active_emitters.append(emitter)
+        return emitter
+
+    def release(self, emitter):
+        emitter.active = False
+        self.free_emitters.append(emitter)
+
+    def clear(self):
+        for emitter in self.active_emitters:
+            self.release(emitter)
+        self.active_emitters = []
+
+    def update(self):
+        super().update()
+        still_active = []
+        for emitter in self.active_emitters:
+            emitter.update()
+            if emitter.is_expired():
+                self.release(emitter)
+            else:
+                still_active.append(emitter)
+        self.active_emitters = still_active
+
+    def get_draw_rect(self):
+        #emitters are culled individually
+        return self.level.rect
+
+    def draw(self):
+        view_rect = g.camera.get_view_rect(g.CULL_MARGIN)
+        for emitter in self.active_emitters:
+            if view_rect.colliderect(emitter.get_draw_rect()):
+                emitter.draw()
+            else:
+                g.profiler.count("culled")
+
+def get_particle_manager(level):
+    """
+    Get the particle manager for a level, creating it if it doesn't have one
+    """
+    if not level.particle_manager or level.particle_manager.deleted:
+        level.particle_manager = ParticleManager(level)
+    return level.particle_manager
+
+def create_particles(level, *args, **kwargs):
+    """
+    Create particles at a point
+    Takes the same arguments as Emitter.start, and returns the emitter
+    """
+    return get_particle_manager(level).emit(*args, **kwargs)
+
 def create_blood(level, pos, angle, headshot=False):
     """
     Create blood particle effects at a point
@@ -73,25 +220,32 @@ def create_blood(level, pos, angle, headshot=False):
         power = 10
         amount = 8
 
-    return Particles(level, pos, angle, "red", 1, amount, power, 10)
+    return create_particles(level, pos, angle, "red", 1, amount, power, 10)
 
 def create_smoke(level, pos):
     """
     Create smoke effect particles at a point
     """
             #level, position, angle, colour, spread, amount, power, timer
-    return Particles(level, pos, -m.pi/2, "gray", 1, 10, 8, 2, gravity=-0.6, size=1)
+    return create_particles(level, pos, -m.pi/2, "gray", 1, 10, 8, 2, gravity=-0.6, size=1)
 
 def create_flash(level, pos, angle):
     """
     Create muzzle flash effect particles at a point
     """
             #level, position, angle, colour, spread, amount, power, timer
-    return Particles(level, pos, angle, "lightyellow", 1, 15, 15, 0.4, gravity=0.5)
+    return create_particles(level, pos, angle, "lightyellow", 1, 15, 15, 0.4, gravity=0.5)
 
 def create_stun_flash(level, pos, angle):
     """
     Create muzzle flash effect particles at a point
     """
             #level, position, angle, colour, spread, amount, power, timer
-    return Particles(level, pos, angle, "lightblue", 1, 15, 15, 0.2, gravity=0.5)
\ No newline at end of file
+    return create_particles(level, pos, angle, "lightblue", 1, 15, 15, 0.2, gravity=0.5)
+
+def create_dust(level, pos, angle):
+    """
+    Create dust particles where a shot hits a wall
+    """
+            #level, position, angle, colour, spread, amount, power, timer
+    return create_particles(level, pos, angle, g.colour_remaps["beige"], 1, 5, 5, 10)
\ No newline at end of file
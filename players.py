@@ -129,6 +129,11 @@ class Player(creatures.Creature):
         self.angle = 0
         self.respawn_time = None
 
+        #set properly every update, but the player can be drawn before the first one
+        self.shoulder_pos = self.rect.move(0, -4).center
+        self.arm_angle = 0
+        self.elbow_angle = 0
+
         self.arm = gfx.load_image("player_arm", alpha=True)
         self.hand = gfx.load_image("player_hand", alpha=True)
         self.smoke_effect = None
@@ -325,10 +330,10 @@ class Player(creatures.Creature):
         
         if self.inventory.selected_item:
             if g.tmx > self.rect.centerx:
-                item_surf = p.transform.flip(self.inventory.selected_item.surface, False, True)
+                item_surf = gfx.get_flipped(self.inventory.selected_item.surface, False, True)
                 item_angle = self.arm_angle  - (m.pi/4)
             else:
-                item_surf = p.transform.flip(self.inventory.selected_item.surface, False, True)
+                item_surf = gfx.get_flipped(self.inventory.selected_item.surface, False, True)
                 item_angle = self.arm_angle + (m.pi/4)
     
             g.camera.draw_rotated_gfx(item_surf, item_angle, (hand_x, hand_y), ox=0.5, oy=0.5, yflip=g.tmx > self.rect.centerx)
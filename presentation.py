@@ -0,0 +1,73 @@
+import pygame as p
+
+import global_values as g
+
+def setup_display(size=None):
+    """
+    Create the window for the current window scale and scale mode, and work out where the screen goes on it
+    The window can be resized, in which case size is the new window size
+    """
+    if g.SCALE_MODE == "scaled":
+        #pygame picks the window size and scales the screen itself
+        g.full_screen = p.display.set_mode((g.WIDTH, g.HEIGHT), p.SCALED)
+        g.SCREEN_WIDTH, g.SCREEN_HEIGHT = g.full_screen.get_size()
+        g.present_rect = g.full_screen.get_rect()
+        g.present_surface = g.full_screen
+        return
+
+    if size is None:
+        size = (g.WIDTH*g.WINDOW_SCALE, g.HEIGHT*g.WINDOW_SCALE)
+    g.SCREEN_WIDTH, g.SCREEN_HEIGHT = size
+    g.full_screen = p.display.set_mode((g.SCREEN_WIDTH, g.SCREEN_HEIGHT), p.RESIZABLE)
+
+    scale = min(g.SCREEN_WIDTH//g.WIDTH, g.SCREEN_HEIGHT//g.HEIGHT)
+    if g.SCALE_MODE == "integer" and scale >= 1:
+        g.present_rect = p.Rect(0, 0, g.WIDTH*scale, g.HEIGHT*scale)
+        g.present_rect.center = g.full_screen.get_rect().center
+    else:
+        #stretch, and integer mode in a window smaller than the screen
+        g.present_rect = g.full_screen.get_rect()
+
+    if g.present_rect == g.full_screen.get_rect():
+        g.present_surface = g.full_screen
+    else:
+        g.present_surface = g.full_screen.subsurface(g.present_rect)
+
+def set_window_scale(scale):
+    """
+    Change the window scale while the game is running
+    """
+    g.WINDOW_SCALE = max(scale, 1)
+    if not g.HEADLESS:
+        setup_display()
+
+def resize_window(size):
+    """
+    Fit the screen to a window the player has resized
+    """
+    if g.SCALE_MODE != "scaled" and not g.HEADLESS:
+        setup_display(size)
+
+def present():
+    """
+    Scale the screen onto the window and show it, without creating any surfaces
+    """
+    if g.present_surface is g.full_screen:
+        if g.SCALE_MODE == "scaled":
+            g.full_screen.blit(g.screen, (0,0))
+        else:
+            p.transform.scale(g.screen, g.present_rect.size, g.full_screen)
+    else:
+        #letterboxed
+        g.full_screen.fill(g.convert_colour("black"))
+        p.transform.scale(g.screen, g.present_rect.size, g.present_surface)
+
+    p.display.flip()
+
+def window_to_screen(pos):
+    """
+    Convert a position on the window to a position on the screen
+    """
+    x = (pos[0]-g.present_rect.x) * (g.WIDTH/g.present_rect.w)
+    y = (pos[1]-g.present_rect.y) * (g.HEIGHT/g.present_rect.h)
+    return x, y
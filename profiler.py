@@ -0,0 +1,151 @@
+import pygame as p
+import time
+import json
+import csv
+from collections import deque
+
+import global_values as g
+
+class FrameProfiler:
+    """
+    Class for recording how long each part of a frame takes
+    Keeps the last few frames in a ring buffer
+    """
+    def __init__(self, history=300):
+        self.enabled = False
+        self.show_overlay = False
+
+        self.frames = deque(maxlen=history)
+        self.current = None
+        self.frame_start = 0
+        self.phase_starts = {}
+
+        #phases shown in the overlay, in order, with their bar colours
+        self.overlay_phases = (("input", "lightblue"), ("update", "green"), ("draw", "yellow"), ("present", "red"))
+
+    def begin_frame(self):
+        """
+        Start recording a new frame
+        """
+        if not self.enabled:
+            return
+        self.current = {"phases":{}, "classes":{}, "counts":{}}
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """
+        Finish recording the current frame and store it
+        """
+        if not self.enabled or self.current is None:
+            return
+        self.current["phases"]["frame"] = (time.perf_counter()-self.frame_start)*1000
+        self.frames.append(self.current)
+        self.current = None
+
+    def start(self, phase):
+        """
+        Start timing a phase of the frame
+        """
+        if self.current is not None:
+            self.phase_starts[phase] = time.perf_counter()
+
+    def stop(self, phase):
+        """
+        Stop timing a phase of the frame, adding to any time it's already taken this frame
+        """
+        if self.current is not None:
+            elapsed = (time.perf_counter()-self.phase_starts[phase])*1000
+            phases = self.current["phases"]
+            phases[phase] = phases.get(phase, 0) + elapsed
+
+    def add_class_time(self, class_name, kind, seconds):
+        """
+        Add time spent on some kind of work (update/draw) for an element of some class
+        """
+        if self.current is not None:
+            classes = self.current["classes"]
+            key = f"{class_name}.{kind}"
+            classes[key] = classes.get(key, 0) + seconds*1000
+
+    def count(self, name, amount=1):
+        """
+        Add to a per-frame counter
+        """
+        if self.current is not None:
+            counts = self.current["counts"]
+            counts[name] = counts.get(name, 0) + amount
+
+    def get_averages(self, key="phases"):
+        """
+        Get the average of each timing (in ms) or counter over the stored frames
+        """
+        totals = {}
+        for frame in self.frames:
+            for name, value in frame[key].items():
+                totals[name] = totals.get(name, 0) + value
+
+        frame_count = max(len(self.frames), 1)
+        return {name:total/frame_count for name, total in totals.items()}
+
+    def get_last_frame(self):
+        if self.frames:
+            return self.frames[-1]
+        return None
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay:
+            self.enabled = True
+
+    def draw_overlay(self):
+        """
+        Draw a bar per phase along the bottom of the screen, full width being one frame at FPS
+        """
+        if not self.show_overlay or not self.frames:
+            return
+
+        phases = self.frames[-1]["phases"]
+        frame_budget = 1000/g.FPS
+        bar_h = 2
+        y = g.HEIGHT - (len(self.overlay_phases)*bar_h)
+
+        for phase, colour in self.overlay_phases:
+            w = int(min(phases.get(phase, 0)/frame_budget, 1)*g.WIDTH)
+            p.draw.rect(g.screen, g.convert_colour("black"), p.Rect(0, y, g.WIDTH, bar_h))
+            if w:
+                p.draw.rect(g.screen, g.convert_colour(colour), p.Rect(0, y, w, bar_h))
+            y += bar_h
+
+    def dump_json(self, path):
+        """
+        Write the stored frames to a json file
+        """
+        with open(path, "w") as dump_file:
+            dump_file.write(json.dumps(list(self.frames), indent=1))
+
+    def dump_csv(self, path):
+        """
+        Write the stored frames to a csv file, one row per frame
+        """
+        columns = []
+        for frame in self.frames:
+            for key in ("phases", "classes", "counts"):
+                for name in frame[key]:
+                    column = (key, name)
+                    if column not in columns:
+                        columns.append(column)
+
+        with open(path, "w", newline="") as dump_file:
+            writer = csv.writer(dump_file)
+            writer.writerow(["frame"] + [f"{key}:{name}" for key, name in columns])
+            for i, frame in enumerate(self.frames):
+                writer.writerow([i] + [frame[key].get(name, 0) for key, name in columns])
+
+    def dump(self, path):
+        """
+        Write the stored frames to a csv or json file, depending on the extension
+        """
+        if path.endswith(".csv"):
+            self.dump_csv(path)
+        else:
+            self.dump_json(path)
@@ -2,44 +2,247 @@ import global_values as g
 import pygame as p
 
 import math as m
+from collections import OrderedDict
 
-def check_collision(rect, obj=None, mask=None, _collision_dict={}, exceptions=[], detail=False):
-    """
-    Check whether a rect is colliding with an object
-    Returns the object if collision occurs, false otherwise
-    """
+def get_collision_dict(_collision_dict):
     collision_dict = {"class_Entity":True, "levels":True}
     collision_dict.update(_collision_dict)
+    return collision_dict
 
-    if collision_dict["levels"] and ((obj and rect not in obj.level.rect) or (not obj and rect not in g.current_level.rect)):
-        return g.current_level
+def get_collision_category(entity):
+    """
+    Get the collision category bit for an entity's class, giving the class a new one if it doesn't have one
+    """
+    registered = g.collision_categories.get(entity.__class__)
+    if registered:
+        return registered[0]
 
-    if obj:
-        for entity in obj.level.entities:
+    category = 1 << len(g.collision_categories)
+    g.collision_categories[entity.__class__] = (category, entity.class_names)
+
+    #existing filters don't know about this class yet
+    g.collision_filters.clear()
+    g.collision_filter_version += 1
+    return category
+
+def compile_collision_dict(_collision_dict):
+    """
+    Compile collision rules (e.g. {"class_Enemy":False}) into a mask of collision category bits
+    Returns the mask and whether the level bounds are collided with
+    """
+    key = frozenset(_collision_dict.items())
+    collision_filter = g.collision_filters.get(key)
+    if collision_filter is None:
+        collision_dict = get_collision_dict(_collision_dict)
+
+        collision_mask = 0
+        for category, class_names in g.collision_categories.values():
             check_collision = True
-            for name in reversed(entity.class_names):
+            for name in reversed(class_names):
                 col_val = collision_dict.get(name, None) 
                 if col_val is not None:
                     check_collision = col_val  
-            
+
             if check_collision:
-                if entity.solid and entity != obj and entity not in exceptions:
-                    if entity.rect.colliderect(rect):
-                        if not detail or not mask:
-                            return entity
-                        else:
-                            #more detailed check
-                            import graphics as gfx
-                            
-                            if entity.surface:
-                                gfx_mask = gfx.get_mask(entity.surface)
-                                #gfx_mask = p.mask.Mask((entity.rect.w, entity.rect.h), fill=True)
-                                if gfx_mask.overlap(mask, (rect.left-entity.rect.left, rect.top-entity.rect.top)):
-                                    return entity
+                collision_mask |= category
+
+        collision_filter = (collision_mask, collision_dict["levels"])
+        g.collision_filters[key] = collision_filter
+
+    return collision_filter
+
+def can_collide(entity, obj, collision_mask, exceptions):
+    """
+    Check whether an entity is something obj collides with under some compiled collision rules
+    """
+    return entity.collision_category & collision_mask and entity.solid and entity is not obj and entity not in exceptions
+
+def check_mask_collision(entity, rect, mask):
+    """
+    More detailed check of whether a mask at a rect overlaps an entity's graphics
+    """
+    import graphics as gfx
+
+    if entity.surface:
+        gfx_mask = gfx.get_mask(entity.surface, *entity.surface_flip)
+        #gfx_mask = p.mask.Mask((entity.rect.w, entity.rect.h), fill=True)
+        if gfx_mask.overlap(mask, (rect.left-entity.rect.left, rect.top-entity.rect.top)):
+            return True
+    return False
+
+def check_collision(rect, obj=None, mask=None, _collision_dict={}, exceptions=[], detail=False, collision_filter=None):
+    """
+    Check whether a rect is colliding with an object
+    collision_filter can be given instead of _collision_dict if it's already compiled
+    Returns the object if collision occurs, false otherwise
+    """
+    if collision_filter is None:
+        collision_filter = compile_collision_dict(_collision_dict)
+    collision_mask, collide_levels = collision_filter
+
+    if collide_levels and ((obj and rect not in obj.level.rect) or (not obj and rect not in g.current_level.rect)):
+        return g.current_level
+
+    if obj:
+        for entity in obj.level.grid.query(rect):
+            if can_collide(entity, obj, collision_mask, exceptions):
+                if entity.rect.colliderect(rect):
+                    if not detail or not mask:
+                        return entity
+                    elif check_mask_collision(entity, rect, mask):
+                        return entity
 
 
     return False
 
+def get_first_step(test, steps):
+    """
+    Get the first step from 1 to steps at which a test goes from false to true, or steps+1 if it never does
+    The test must stay true once it is true
+    """
+    low = 1
+    high = steps
+    while low <= high:
+        mid = (low+high)//2
+        if test(mid):
+            high = mid-1
+        else:
+            low = mid+1
+    return low
+
+def get_overlap_steps(get_pos, step, size, low, high, steps):
+    """
+    Get the first and last step at which a span moving by step each step overlaps low to high
+    """
+    if step > 0:
+        first = get_first_step(lambda k: get_pos(k)+size > low, steps)
+        last = get_first_step(lambda k: get_pos(k) >= high, steps)-1
+    elif step < 0:
+        first = get_first_step(lambda k: get_pos(k) < high, steps)
+        last = get_first_step(lambda k: get_pos(k)+size <= low, steps)-1
+    else:
+        pos = get_pos(1)
+        if pos < high and pos+size > low:
+            return 1, steps
+        return steps+1, steps
+
+    return first, last
+
+def get_exit_step(get_pos, step, size, low, high, steps):
+    """
+    Get the first step at which a span moving by step each step is no longer inside low to high
+    """
+    if step > 0:
+        return get_first_step(lambda k: get_pos(k)+size > high, steps)
+    elif step < 0:
+        return get_first_step(lambda k: get_pos(k) < low, steps)
+
+    pos = get_pos(1)
+    if pos < low or pos+size > high:
+        return 1
+    return steps+1
+
+def sweep(x, y, w, h, dx, dy, obj=None, level=None, mask=None, _collision_dict={}, exceptions=[], detail=False, collision_filter=None):
+    """
+    Find where a w by h box at x, y moving by dx, dy in unit steps first collides
+    Gives the same result as calling check_collision at every step, but each candidate is solved
+    for directly instead, with the mask check only done where a candidate's box is hit
+    Returns the number of steps taken before colliding, and what was collided with (or False)
+    """
+    steps = m.ceil(max(abs(dx), abs(dy)))
+    if not steps:
+        return 0, False
+
+    ax = dx/steps
+    ay = dy/steps
+    if level is None:
+        level = obj.level if obj else g.current_level
+
+    probe = p.Rect(0, 0, w, h)
+    def get_x(k):
+        probe.x = x + (ax*k)
+        return probe.x
+    def get_y(k):
+        probe.y = y + (ay*k)
+        return probe.y
+
+    if collision_filter is None:
+        collision_filter = compile_collision_dict(_collision_dict)
+    collision_mask, collide_levels = collision_filter
+
+    #first step outside the level
+    hit_step = steps+1
+    result = False
+    if collide_levels:
+        bounds = level.rect
+        hit_step = min(get_exit_step(get_x, ax, w, bounds.left, bounds.right, steps),
+                       get_exit_step(get_y, ay, h, bounds.top, bounds.bottom, steps))
+        if hit_step <= steps:
+            result = g.current_level
+
+    #first step hitting an entity
+    start_rect = p.Rect(get_x(1), get_y(1), w, h)
+    swept_rect = start_rect.union(p.Rect(get_x(steps), get_y(steps), w, h))
+
+    for entity in level.grid.query(swept_rect):
+        if not entity.rect.colliderect(swept_rect) or not can_collide(entity, obj, collision_mask, exceptions):
+            continue
+
+        first_x, last_x = get_overlap_steps(get_x, ax, w, entity.rect.left, entity.rect.right, steps)
+        first_y, last_y = get_overlap_steps(get_y, ay, h, entity.rect.top, entity.rect.bottom, steps)
+        first = max(first_x, first_y)
+        last = min(last_x, last_y, hit_step-1)
+        if first > last:
+            continue
+
+        if not detail or not mask:
+            hit_step = first
+            result = entity
+        else:
+            #only check the mask where the boxes actually overlap
+            for k in range(first, last+1):
+                probe.x = x + (ax*k)
+                probe.y = y + (ay*k)
+                if check_mask_collision(entity, probe, mask):
+                    hit_step = k
+                    result = entity
+                    break
+
+    return hit_step-1, result
+
+point_mask = None
+def get_point_mask():
+    """
+    Get a shared 1x1 filled mask, for checking collisions of single points
+    """
+    global point_mask
+    if point_mask is None:
+        point_mask = p.mask.Mask((1, 1), fill=True)
+    return point_mask
+
+def raycast(level, origin, angle, ray_range, exceptions=[], _collision_dict={}, detail=True):
+    """
+    Cast a ray from a point through a level, stopping at the first thing it hits
+    Returns the entity hit (or None), the last point before the hit, and whether the level bounds were hit
+    """
+    x, y = origin
+    dx = m.cos(angle)*ray_range
+    dy = m.sin(angle)*ray_range
+
+    steps = m.ceil(max(abs(dx), abs(dy)))
+    if not steps:
+        return None, (x, y), False
+
+    free_steps, result = sweep(x, y, 1, 1, dx, dy, level=level, mask=get_point_mask(),
+                               _collision_dict=_collision_dict, exceptions=exceptions, detail=detail)
+    if not result:
+        return None, (x+dx, y+dy), False
+
+    hit_point = (x+(dx/steps)*free_steps, y+(dy/steps)*free_steps)
+    if result is g.current_level:
+        return None, hit_point, True
+    return result, hit_point, False
+
 def interpolate(v1, v2, amount):
     """
     Interpolate between two values
@@ -58,4 +261,30 @@ def get_angle(x1, y1, x2, y2):
     """
     dx = (x2-x1)
     dy = (y2-y1)
-    return m.atan2(dy, dx)
\ No newline at end of file
+    return m.atan2(dy, dx)
+
+class LRUCache:
+    """
+    Class for a cache holding a limited number of values, dropping the least recently used
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.values = OrderedDict()
+
+    def get(self, key, default=None):
+        value = self.values.get(key, default)
+        if key in self.values:
+            self.values.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.values[key] = value
+        self.values.move_to_end(key)
+        if len(self.values) > self.max_size:
+            self.values.popitem(last=False)
+
+    def clear(self):
+        self.values.clear()
+
+    def __len__(self):
+        return len(self.values)